@@ -0,0 +1,285 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from result_cache import result_cache
+
+# ================= CONFIG =================
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", 2))    # worker processes
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 8))      # pending jobs before /analyze rejects
+MAX_FINISHED_JOBS = 100                                          # finished jobs kept for /jobs/<id>
+WORKER_SUBSYSTEMS = ("model", "database")                        # subsystems analysis workers use
+WORKER_WARMUP_TIMEOUT = 300                                      # seconds warm_up() waits for the workers
+# =========================================
+
+
+def _preload_from_env():
+    """Worker subsystems named in PRELOAD_SUBSYSTEMS, loaded when each worker starts"""
+    names = [name.strip() for name in os.environ.get("PRELOAD_SUBSYSTEMS", "").split(",")]
+    return [name for name in names if name in WORKER_SUBSYSTEMS]
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when MAX_QUEUED_JOBS jobs are already waiting"""
+
+
+def _init_worker(preload, startup_reports):
+    """Worker-process initializer: load `preload` subsystems before the first job"""
+    from startup import warm_up, startup_report
+
+    startup_reports[os.getpid()] = warm_up(preload) if preload else startup_report()
+
+
+def _warm_worker(subsystems, barrier, startup_reports):
+    """Load `subsystems` in one worker; the barrier spreads the calls over every worker"""
+    from startup import warm_up
+
+    startup_reports[os.getpid()] = warm_up(subsystems)
+    try:
+        barrier.wait(WORKER_WARMUP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass  # busy workers warm up on their next job instead
+
+
+def _run_job(job_id, video_path, junction_name, camera, progress, cancel_event, preempt_queue, detect_only=False, early_exit=False, tiled=False):
+    """
+    Worker-process entry point: run analyze_video and report progress.
+
+    An early-exit verdict is published in the progress entry as soon as it
+    is known; the job itself returns the complete result once the
+    annotated video is finished.
+    """
+    from emergency_core import analyze_video
+
+    progress[job_id] = {"frames_done": 0, "total_frames": 0, "started_at": time.time()}
+
+    def report(frames_done, total_frames):
+        entry = progress[job_id]
+        entry.update(frames_done=frames_done, total_frames=total_frames)
+        progress[job_id] = entry
+
+    def early_result(result):
+        entry = progress[job_id]
+        entry["early_result"] = result
+        progress[job_id] = entry
+
+    def preempt(lane, junction):
+        # Signal state lives in the web process, forward the trigger there
+        preempt_queue.put((lane, junction))
+
+    return analyze_video(
+        video_path,
+        junction_name,
+        camera=camera,
+        progress_callback=report,
+        cancel_event=cancel_event,
+        on_preempt=preempt,
+        detect_only=detect_only,
+        early_exit=early_exit,
+        on_early_result=early_result,
+        tiled=tiled,
+    )
+
+
+class AnalysisJobs:
+    """
+    Bounded queue of video analysis jobs run on a process pool.
+
+    The pool, and the manager process used for progress and cancellation,
+    are only started by the first submit(), so importing this module is
+    cheap. Job records live in this process: with several gunicorn
+    workers, /jobs/<id> must be routed to the worker that accepted the job.
+    """
+
+    def __init__(self, workers=ANALYSIS_WORKERS, max_queued=MAX_QUEUED_JOBS, preload=None):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.preload = _preload_from_env() if preload is None else list(preload)
+        self.jobs = {}
+        self.lock = threading.RLock()
+        self.pool = None
+        self.manager = None
+
+    def _start(self):
+        context = multiprocessing.get_context("spawn")
+        self.manager = context.Manager()
+        self.progress = self.manager.dict()
+        self.preempt_queue = self.manager.Queue()
+        self.startup_reports = self.manager.dict()
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=context,
+            initializer=_init_worker, initargs=(self.preload, self.startup_reports)
+        )
+        threading.Thread(target=self._forward_preemptions, daemon=True).start()
+        print(f"⚙ Analysis pool started with {self.workers} worker process(es)")
+
+    def warm_up(self, subsystems=WORKER_SUBSYSTEMS):
+        """
+        Start every worker process with `subsystems` loaded (the model lives
+        in the workers, not the web process) and return their startup reports.
+        """
+        with self.lock:
+            if self.pool is None:
+                self.preload = list(dict.fromkeys(self.preload + list(subsystems)))
+                self._start()
+            barrier = self.manager.Barrier(self.workers)
+            futures = [
+                self.pool.submit(_warm_worker, list(subsystems), barrier, self.startup_reports)
+                for _ in range(self.workers)
+            ]
+        for future in futures:
+            future.result()
+        return self.worker_reports()
+
+    def worker_reports(self):
+        """Startup timings of the worker processes started so far, by PID"""
+        if self.pool is None:
+            return {}
+        return {str(pid): report for pid, report in self.startup_reports.items()}
+
+    def _forward_preemptions(self):
+        from signal_controller import controller
+        while True:
+            try:
+                lane, junction_name = self.preempt_queue.get()
+            except (EOFError, OSError):
+                return  # manager shut down
+            controller.trigger_emergency(lane, junction_name)
+
+    def submit(self, video_path, junction_name, camera=None, cache_key=None, detect_only=False, early_exit=False, tiled=False):
+        """
+        Queue an analysis and return its job ID; the result is cached under `cache_key`.
+
+        The job owns `video_path`: the upload is deleted once the job has
+        finished, failed or been cancelled.
+        """
+        with self.lock:
+            if self.pool is None:
+                self._start()
+
+            queued = sum(
+                1 for job in self.jobs.values()
+                if job["finished_at"] is None and job["id"] not in self.progress
+            )
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"{queued} analysis jobs already queued")
+
+            job_id = uuid.uuid4().hex
+            cancel_event = self.manager.Event()
+            job = {
+                "id": job_id,
+                "status": "queued",
+                "junction": junction_name,
+                "video": os.path.basename(video_path),
+                "video_path": video_path,
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "cancel_event": cancel_event,
+                "cache_key": cache_key,
+            }
+            self.jobs[job_id] = job
+            job["future"] = self.pool.submit(
+                _run_job, job_id, video_path, junction_name, camera,
+                self.progress, cancel_event, self.preempt_queue, detect_only, early_exit, tiled
+            )
+            job["future"].add_done_callback(lambda future, job_id=job_id: self._finished(job_id, future))
+            self._prune()
+            return job_id
+
+    def _finished(self, job_id, future):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            error = None if future.cancelled() else future.exception()
+            if future.cancelled():
+                job["status"] = "cancelled"
+            elif error is None:
+                job["status"] = "done"
+                job["result"] = future.result()
+            elif type(error).__name__ == "AnalysisCancelled":
+                job["status"] = "cancelled"
+            else:
+                job["status"] = "failed"
+                job["error"] = str(error)
+                print(f"❌ Analysis job {job_id} failed: {error}")
+
+        # The job owned its upload
+        try:
+            os.remove(job["video_path"])
+        except OSError:
+            pass
+
+        # Every job may have written to output/, cached or not
+        if job["status"] == "done" and job["cache_key"]:
+            result_cache.put(job["cache_key"], job["result"])
+        else:
+            result_cache.trim()
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j["finished_at"] is not None]
+        finished.sort(key=lambda j: j["finished_at"])
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job["id"]]
+            self.progress.pop(job["id"], None)
+
+    def get(self, job_id):
+        """
+        Status, progress and (when done) result of a job, or None.
+
+        An early-exit job whose verdict is in but whose video is still
+        being written is "annotating", with the early result (no
+        output_video); it moves to "done" with the complete result.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+
+            progress = dict(self.progress.get(job_id, {}))
+            if job["status"] == "queued" and progress:
+                job["status"] = "running"
+            result = job["result"]
+            if job["status"] in ("running", "annotating") and "early_result" in progress:
+                job["status"] = "annotating"
+                result = progress["early_result"]
+
+            frames_done = progress.get("frames_done", 0)
+            total_frames = progress.get("total_frames", 0)
+            eta = None
+            if job["status"] in ("running", "annotating") and frames_done and total_frames:
+                elapsed = time.time() - progress["started_at"]
+                eta = round(elapsed * (total_frames - frames_done) / frames_done, 1)
+
+            return {
+                "job_id": job_id,
+                "status": job["status"],
+                "junction": job["junction"],
+                "video": job["video"],
+                "frames_done": frames_done,
+                "total_frames": total_frames,
+                "percent": round(100 * frames_done / total_frames, 1) if total_frames else None,
+                "eta_seconds": eta,
+                "result": result,
+                "error": job["error"],
+            }
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running one to stop; False if unknown or finished"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["finished_at"] is not None:
+                return False
+            if not job["future"].cancel():
+                job["cancel_event"].set()
+            return True
+
+
+# Global instance
+jobs = AnalysisJobs()
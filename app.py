@@ -1,10 +1,19 @@
-from flask import Flask, request, jsonify, send_from_directory
+import time
+_boot_start = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
+import uuid
 import sqlite3  # Add this import
 import json     # Add this import
+from werkzeug.utils import secure_filename
 
-from emergency_core import analyze_video
+from analysis_jobs import jobs, JobQueueFull
+from result_cache import result_cache, cache_key, overlay_state
+from startup import record_timing, startup_report, warm_up, SUBSYSTEM_MODULES
+from stream_ingest import ingest
+from event_stream import events, TooManyClients
 from signal_controller import controller
 from database import db
 from ambulance_auth import ambulance_auth
@@ -30,15 +39,79 @@ def analyze():
     
     # Get junction from request (default to Main Square)
     junction_name = request.form.get("junction", "Main Square Junction")
+    # Optional config.json video_sources key, enables detection-zone cropping
+    camera = request.form.get("camera")
+    # Pollers that only need the verdict skip annotation/encoding and stop early
+    detect_only = request.form.get("detect_only", "").lower() in ("1", "true", "yes")
+    # Scheduled emergencies: return once confirmed, finish the video in the background
+    early_exit = request.form.get("early_exit", "").lower() in ("1", "true", "yes")
+    # High-resolution cameras: overlapping tiles find distant vehicles earlier
+    tiled = request.form.get("tiled", "").lower() in ("1", "true", "yes")
     
     video = request.files["video"]
-    video_path = os.path.join(UPLOAD_FOLDER, video.filename)
+    # Server-generated name: a queued job must not see its clip overwritten
+    # by a later upload with the same client filename
+    extension = os.path.splitext(secure_filename(video.filename))[1]
+    video_path = os.path.join(UPLOAD_FOLDER, uuid.uuid4().hex + extension)
     video.save(video_path)
 
-    # Analyze with junction parameter
-    result = analyze_video(video_path, junction_name)
-    
-    return jsonify(result)
+    # Same clip analyzed before: reuse the result, re-applying junction side effects
+    key = cache_key(video_path, camera, tiled)
+    cached = result_cache.get(key)
+    if cached:
+        from emergency_core import replay_vehicle_events
+        result = replay_vehicle_events(
+            cached["vehicle_events"], junction_name,
+            cached["output_filename"], cached["stage_timings"]
+        )
+        # The stored video shows the original junction and banner
+        if overlay_state(result) != cached.get("overlay"):
+            result["output_video"] = None
+        result["cached"] = True
+        os.remove(video_path)
+        return jsonify(result)
+
+    # Queue the analysis; the worker pool keeps request workers free
+    try:
+        job_id = jobs.submit(
+            video_path, junction_name, camera=camera,
+            # Partial verdicts never reach the cache a full analysis reads
+            cache_key=None if detect_only or early_exit else key,
+            detect_only=detect_only, early_exit=early_exit, tiled=tiled
+        )
+    except JobQueueFull as e:
+        os.remove(video_path)
+        return jsonify({"error": "Analysis queue is full, try again later", "details": str(e)}), 503
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Status, progress, ETA and final result of an analysis job"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/progress", methods=["GET"])
+def get_job_progress(job_id):
+    """Lightweight progress view of an analysis job (no result payload)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    job.pop("result")
+    return jsonify(job)
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued or running analysis job"""
+    if not jobs.cancel(job_id):
+        return jsonify({"error": "Job not found or already finished"}), 404
+    return jsonify({"job_id": job_id, "status": "cancelling"})
 
 @app.route("/output/<filename>")
 def get_output_video(filename):
@@ -46,10 +119,16 @@ def get_output_video(filename):
 
 # ---------------- SIGNAL API ----------------
 
+def _snapshot_response(etag, body):
+    """Pre-serialized controller snapshot; unchanged versions answer 304"""
+    response = Response(body, mimetype="application/json")
+    response.set_etag(str(etag))
+    return response.make_conditional(request)
+
 @app.route("/signal-status", methods=["GET"])
 def signal_status():
     try:
-        return jsonify(controller.get_status())
+        return _snapshot_response(*controller.get_all_junctions_status_json())
     except Exception as e:
         print("❌ ERROR in /signal-status:", e)
         return jsonify({
@@ -96,13 +175,15 @@ def force_emergency():
     data = request.json
     lane = data.get("lane", "LANE_1")
     junction = data.get("junction", "Main Square Junction")
+    priority = int(data.get("priority", 0))
     
-    controller.trigger_emergency(lane, junction)
+    outcome = controller.trigger_emergency(lane, junction, priority=priority)
     
     return jsonify({
         "status": "EMERGENCY ACTIVATED", 
         "lane": lane,
-        "junction": junction
+        "junction": junction,
+        "preemption": outcome
     })
 
 @app.route("/admin/reset", methods=["POST"])
@@ -124,6 +205,33 @@ def toggle_priority():
     controller.toggle_priority(enabled)
     return jsonify({"priority_enabled": enabled})
 
+@app.route("/admin/junctions", methods=["POST"])
+def add_junction():
+    """Add a junction and start its signal cycle"""
+    data = request.json or {}
+    name = data.get("name")
+    if not name:
+        return jsonify({"error": "Junction name is required"}), 400
+    try:
+        junction_id = controller.add_junction(
+            name, int(data.get("lanes", 4)), data.get("location"), data.get("description")
+        )
+    except sqlite3.IntegrityError:
+        return jsonify({"error": f"Junction {name} already exists"}), 409
+    return jsonify({"id": junction_id, "name": name})
+
+@app.route("/admin/junctions/<junction_name>", methods=["DELETE"])
+def remove_junction(junction_name):
+    """Remove a junction and stop its signal cycle"""
+    if not controller.remove_junction(junction_name):
+        return jsonify({"error": "Junction not found"}), 404
+    return jsonify({"message": f"Junction {junction_name} removed"})
+
+@app.route("/admin/junctions/reload", methods=["POST"])
+def reload_junctions():
+    """Pick up junctions added or removed directly in the database"""
+    return jsonify({"junctions": controller.reload_junctions()})
+
 # Add this import at the top
 import sqlite3
 
@@ -207,14 +315,14 @@ def get_emergencies_by_junction():
 @app.route("/all-junctions-status", methods=["GET"])
 def get_all_junctions_status():
     """Get signal status for ALL junctions"""
-    return jsonify(controller.get_all_junctions_status())
+    return _snapshot_response(*controller.get_all_junctions_status_json())
 
 @app.route("/junction-status/<junction_name>", methods=["GET"])
 def get_junction_status(junction_name):
     """Get signal status for specific junction"""
-    status = controller.get_junction_status(junction_name)
+    status = controller.get_junction_status_json(junction_name)
     if status:
-        return jsonify(status)
+        return _snapshot_response(*status)
     return jsonify({"error": "Junction not found"}), 404
 
 @app.route("/monitor-junction", methods=["POST"])
@@ -229,6 +337,53 @@ def monitor_junction():
         "junction": junction_name
     })
 
+def _warm_up(names=None):
+    """Warm up subsystems; the model is only used by the analysis worker processes"""
+    names = names or list(SUBSYSTEM_MODULES)
+    web_names = [name for name in names if name != "model"]
+    report = warm_up(web_names) if web_names else startup_report()
+    if "model" in names:
+        report["analysis_workers"] = jobs.warm_up()
+    return report
+
+@app.route("/admin/warmup", methods=["POST"])
+def warmup():
+    """Initialize lazily loaded subsystems (model, signal controller, database) now"""
+    data = request.get_json(silent=True) or {}
+    return jsonify(_warm_up(data.get("subsystems")))
+
+@app.route("/admin/startup-report", methods=["GET"])
+def get_startup_report():
+    """Per-subsystem initialization timings of this process and the analysis workers"""
+    report = startup_report()
+    report["analysis_workers"] = jobs.worker_reports()
+    return jsonify(report)
+
+@app.route("/events", methods=["GET"])
+def event_stream():
+    """Server-Sent Events: signal phase changes and emergency lifecycle deltas"""
+    try:
+        chunks, release = events.stream(request.headers.get("Last-Event-ID") or request.args.get("last_event_id"))
+    except TooManyClients as e:
+        return jsonify({"error": "Too many event streams open", "details": str(e)}), 503
+    response = Response(chunks, mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # no proxy buffering (nginx)
+    })
+    # Frees the slot even if the client goes away before the stream starts
+    response.call_on_close(release)
+    return response
+
+@app.route("/events/metrics", methods=["GET"])
+def event_metrics():
+    """Connected event stream clients and the newest event ID"""
+    return jsonify(events.metrics())
+
+@app.route("/streams/metrics", methods=["GET"])
+def stream_metrics():
+    """Per-camera FPS, lag and dropped-frame counters of the stream ingestion service"""
+    return jsonify(ingest.metrics())
+
 @app.route("/reset-junction/<junction_name>", methods=["POST"])
 def reset_junction(junction_name):
     """Reset specific junction to normal mode"""
@@ -238,5 +393,15 @@ def reset_junction(junction_name):
         "junction": junction_name
     })
 
+record_timing("app_import", time.perf_counter() - _boot_start)
+
+# Optional preload hook, e.g. PRELOAD_SUBSYSTEMS=model,signal_controller,database
+if os.environ.get("PRELOAD_SUBSYSTEMS"):
+    _warm_up([name.strip() for name in os.environ["PRELOAD_SUBSYSTEMS"].split(",") if name.strip()])
+
+# Optional continuous ingestion of config.json video_sources, e.g. STREAM_INGEST=1
+if os.environ.get("STREAM_INGEST"):
+    ingest.start()
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
\ No newline at end of file
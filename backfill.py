@@ -0,0 +1,27 @@
+"""
+Archive backfill: analyze long junction recordings in parallel chunks.
+
+    python backfill.py VIDEO [VIDEO ...] --junction "Main Square Junction" --workers 8
+"""
+
+import argparse
+import json
+
+from emergency_core import analyze_video_chunked, CHUNK_WORKERS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze long videos in parallel chunks")
+    parser.add_argument("videos", nargs="+", help="video files to analyze")
+    parser.add_argument("--junction", default="Main Square Junction", help="junction the camera belongs to")
+    parser.add_argument("--camera", default=None, help="config.json video_sources key (zone cropping)")
+    parser.add_argument("--workers", type=int, default=CHUNK_WORKERS, help="worker processes")
+    args = parser.parse_args()
+
+    for video in args.videos:
+        result = analyze_video_chunked(video, args.junction, workers=args.workers, camera=args.camera)
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Reproducible per-stage benchmark of the vision pipeline.
+
+Runs the analyze_video stages - decode, preprocess, inference,
+postprocess, annotate, encode - one after another on every frame so each
+can be timed on its own, over:
+
+  * the bundled dataset images (project/datasets/emergency_vehicles), and
+  * synthetic videos generated at several resolutions (moving boxes on a
+    noisy background, so the codec has real work to do).
+
+Reports frames/sec, p50/p99/mean latency per stage, peak RSS and CPU
+utilization as JSON. Everything runs offline on the CPU.
+
+    python benchmark_vision.py --output bench.json
+    python benchmark_vision.py --backend onnx --resolutions 1280x720 3840x2160 --frames 120
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detection_zones import zone_crops, load_detection_zones
+from vehicle_tracker import VehicleTracker
+
+# ================= CONFIG =================
+DATASET_IMAGES = "project/datasets/emergency_vehicles/valid/images"
+RESOLUTIONS = ["640x360", "1280x720", "1920x1080", "3840x2160"]
+SYNTHETIC_FRAMES = 60       # frames per synthetic video
+SYNTHETIC_FPS = 25
+IMAGE_LIMIT = 100           # dataset images per run
+WARMUP_CALLS = 3            # model calls before timing starts
+STAGES = ("decode", "preprocess", "inference", "postprocess", "annotate", "encode")
+# =========================================
+
+
+def make_synthetic_video(path, width, height, frames=SYNTHETIC_FRAMES, fps=SYNTHETIC_FPS, seed=0):
+    """Write a deterministic clip of moving, vehicle-sized boxes"""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(40, 120, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    boxes = [
+        (rng.integers(0, width), rng.integers(0, height), rng.integers(-8, 9), rng.integers(-4, 5),
+         tuple(int(c) for c in rng.integers(0, 256, 3)))
+        for _ in range(12)
+    ]
+    box_w, box_h = max(8, width // 12), max(6, height // 14)
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        frame = background.copy()
+        for x, y, dx, dy, color in boxes:
+            x1 = int((x + dx * i * width / 640) % width)
+            y1 = int((y + dy * i * height / 360) % height)
+            cv2.rectangle(frame, (x1, y1), (x1 + box_w, y1 + box_h), color, -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def _video_frames(path):
+    cap = cv2.VideoCapture(str(path))
+    try:
+        while True:
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            elapsed = time.perf_counter() - start
+            if not ret:
+                return
+            yield frame, elapsed
+    finally:
+        cap.release()
+
+
+def _image_frames(paths):
+    for path in paths:
+        start = time.perf_counter()
+        frame = cv2.imread(str(path))
+        elapsed = time.perf_counter() - start
+        if frame is not None:
+            yield frame, elapsed
+
+
+def _percentiles(samples_ms):
+    if not samples_ms:
+        return {"p50_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    return {
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 3),
+        "mean_ms": round(float(np.mean(samples_ms)), 3),
+    }
+
+
+def run_pipeline(name, frames, detector, batch_size, camera=None, encode_path=None):
+    """
+    Time every stage over `frames` (an iterator of (frame, decode_seconds)).
+
+    Frames are batched through the detector like analyze_video. When the
+    result reports ultralytics' own preprocess/postprocess split it is
+    used; otherwise the whole call counts as inference. Encoding writes
+    an MP4 for videos (`encode_path`) and JPEGs for images.
+    """
+    from emergency_core import CONF_THRESHOLD, extract_detections, new_analysis_state, process_detections
+
+    timings = {stage: [] for stage in STAGES}
+    tracker = VehicleTracker()
+    state = new_analysis_state(side_effects=False)
+    writer = None
+    zones = load_detection_zones(camera)
+    regions_by_size = {}  # dataset images differ in size
+    frame_index = 0
+    batch = []  # (frame, regions)
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+
+    def flush():
+        nonlocal frame_index, writer
+        # Preprocess: our side (zone crops); ultralytics letterboxing is added below
+        start = time.perf_counter()
+        inputs = [frame[y1:y2, x1:x2] for frame, regions in batch for x1, y1, x2, y2 in regions]
+        crop_seconds = (time.perf_counter() - start) / len(batch)
+
+        start = time.perf_counter()
+        results = detector(inputs, conf=CONF_THRESHOLD, verbose=False)
+        call_ms = (time.perf_counter() - start) * 1000 / len(batch)
+
+        # ultralytics reports per-image ms for each of its own stages
+        speed = getattr(results[0], "speed", None) if len(results) else None
+        if speed and speed.get("inference") is not None:
+            per_frame = len(inputs) / len(batch)
+            pre_ms = (speed.get("preprocess") or 0.0) * per_frame
+            post_ms = (speed.get("postprocess") or 0.0) * per_frame
+            infer_ms = max(0.0, call_ms - pre_ms - post_ms)
+        else:
+            pre_ms, post_ms, infer_ms = 0.0, 0.0, call_ms
+
+        results_iter = iter(results)
+        for frame, regions in batch:
+            frame_index += 1
+            timings["preprocess"].append(crop_seconds * 1000 + pre_ms)
+            timings["inference"].append(infer_ms)
+
+            start = time.perf_counter()
+            detections = extract_detections(results_iter, regions)
+            timings["postprocess"].append(post_ms + (time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                process_detections(frame, frame_index, detections, tracker, state, name, None, name)
+            timings["annotate"].append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            if encode_path is not None:
+                if writer is None:
+                    h, w = frame.shape[:2]
+                    writer = cv2.VideoWriter(str(encode_path), cv2.VideoWriter_fourcc(*"mp4v"), SYNTHETIC_FPS, (w, h))
+                writer.write(frame)
+            else:
+                cv2.imencode(".jpg", frame)
+            timings["encode"].append((time.perf_counter() - start) * 1000)
+        batch.clear()
+
+    for frame, decode_seconds in frames:
+        timings["decode"].append(decode_seconds * 1000)
+        h, w = frame.shape[:2]
+        if (w, h) not in regions_by_size:
+            regions_by_size[(w, h)] = zone_crops(zones, w, h) or [(0, 0, w, h)]
+        batch.append((frame, regions_by_size[(w, h)]))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if writer is not None:
+        writer.release()
+
+    wall = time.perf_counter() - wall_start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_seconds = (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime)
+    frames_done = len(timings["decode"])
+
+    return {
+        "input": name,
+        "frames": frames_done,
+        "wall_seconds": round(wall, 3),
+        "fps": round(frames_done / wall, 2) if wall > 0 else 0.0,
+        "stages": {stage: _percentiles(samples) for stage, samples in timings.items()},
+        # ru_maxrss is in KiB on Linux and never decreases within a process
+        "peak_rss_mb": round(usage_end.ru_maxrss / 1024, 1),
+        "cpu_percent": round(100 * cpu_seconds / wall, 1) if wall > 0 else 0.0,
+        "cpu_percent_of_machine": round(100 * cpu_seconds / wall / (os.cpu_count() or 1), 1) if wall > 0 else 0.0,
+    }
+
+
+def _environment(backend, weights, batch_size):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "backend": backend,
+        "weights": weights,
+        "batch_size": batch_size,
+    }
+
+
+def main():
+    from emergency_core import MODEL_PATH, BATCH_SIZE
+    from inference_backends import BACKENDS, configured_backend, load_detector
+
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the vision pipeline")
+    parser.add_argument("--weights", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=list(BACKENDS), default=None,
+                        help="inference backend (default: the one in config.json)")
+    parser.add_argument("--resolutions", nargs="*", default=RESOLUTIONS, help="WIDTHxHEIGHT of synthetic videos")
+    parser.add_argument("--frames", type=int, default=SYNTHETIC_FRAMES, help="frames per synthetic video")
+    parser.add_argument("--images", default=DATASET_IMAGES)
+    parser.add_argument("--image-limit", type=int, default=IMAGE_LIMIT)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--camera", help="config.json video_sources entry to apply zone cropping for")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    backend = args.backend or configured_backend()
+    with contextlib.redirect_stdout(sys.stderr):
+        detector = load_detector(args.weights, backend=backend)
+        warmup = np.zeros((640, 640, 3), dtype=np.uint8)
+        for _ in range(WARMUP_CALLS):
+            detector([warmup], verbose=False)
+
+    report = {"environment": _environment(backend, args.weights, args.batch_size), "runs": []}
+
+    images = sorted(Path(args.images).glob("*.jpg"))[:args.image_limit]
+    if images:
+        print(f"📷 Dataset: {len(images)} images", file=sys.stderr)
+        report["runs"].append(run_pipeline("dataset", _image_frames(images), detector, args.batch_size))
+    else:
+        print(f"⚠ No images in {args.images}, skipping dataset run", file=sys.stderr)
+
+    workdir = tempfile.mkdtemp(prefix="vision_bench_")
+    try:
+        for resolution in args.resolutions:
+            width, height = (int(v) for v in resolution.lower().split("x"))
+            source = make_synthetic_video(Path(workdir) / f"synthetic_{resolution}.mp4", width, height, args.frames)
+            print(f"🎞 Synthetic {resolution}: {args.frames} frames", file=sys.stderr)
+            report["runs"].append(run_pipeline(
+                f"synthetic_{resolution}", _video_frames(source), detector, args.batch_size,
+                camera=args.camera, encode_path=Path(workdir) / f"annotated_{resolution}.mp4"
+            ))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"📝 Benchmark written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
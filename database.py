@@ -1,10 +1,13 @@
 import sqlite3
+from contextlib import closing
 from datetime import datetime
 import json
 import os
 import hashlib
 import secrets
 
+from startup import LazySubsystem
+
 
 class TrafficDatabase:
     def __init__(self, db_path="traffic_db.sqlite3"):
@@ -473,6 +476,21 @@ class TrafficDatabase:
             for j in junctions
         ]
 
+    def add_junction(self, junction_name, total_lanes=4, location=None, description=None):
+        """Add a junction; returns its ID (sqlite3.IntegrityError if the name is taken)"""
+        # Roll back and close on errors too, or the open write keeps the database locked
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            cursor = conn.execute(
+                "INSERT INTO junctions (junction_name, total_lanes, location, description) VALUES (?, ?, ?, ?)",
+                (junction_name, total_lanes, location, description),
+            )
+            return cursor.lastrowid
+
+    def remove_junction(self, junction_id):
+        """Delete a junction"""
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute("DELETE FROM junctions WHERE id = ?", (junction_id,))
+
     def get_hospitals_list(self):
         """Get list of hospitals"""
         conn = sqlite3.connect(self.db_path)
@@ -605,5 +623,5 @@ def verify_password(stored_hash, password):
     return test_hash == hash_value
 
 
-# Global database instance
-db = TrafficDatabase()
\ No newline at end of file
+# Global database instance (schema/seed run on first use, not at import)
+db = LazySubsystem("database", TrafficDatabase)
\ No newline at end of file
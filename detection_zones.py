@@ -0,0 +1,170 @@
+import json
+
+# ================= CONFIG =================
+CONFIG_PATH = "config.json"
+ZONE_PADDING = 32           # pixels of context kept around each zone
+ZONE_RESOLUTION = (3840, 2160)  # frame size zone polygons are drawn at, unless a source sets zone_resolution
+MIN_CROP_SIZE = 64          # crops with a shorter side are degenerate; analyze the full frame instead
+MODEL_INPUT_SIZE = 640      # frames no larger than this already reach the model at full resolution
+SINGLE_CROP_RATIO = 0.8     # use one crop if separate crops cover >= 80% of it
+TILE_SIZE = 1280            # tiled inference: tile edge in source pixels
+TILE_OVERLAP = 0.2          # fraction of a tile shared with its neighbour
+TILE_MERGE_IOU = 0.5        # boxes overlapping this much are the same vehicle
+TILE_MERGE_IOS = 0.6        # ... or when the smaller box is mostly inside the other (cut at a tile edge)
+# =========================================
+
+
+def load_detection_zones(camera, config_path=CONFIG_PATH):
+    """Return the detection zone polygons of a `video_sources` camera ([] if none)"""
+    if not camera:
+        return []
+
+    try:
+        with open(config_path) as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠ Could not read detection zones from {config_path}: {e}")
+        return []
+
+    source = config.get("video_sources", {}).get(camera)
+    if not source:
+        print(f"⚠ Unknown camera '{camera}', analyzing full frame")
+        return []
+    return source_zones(source)
+
+
+def source_zones(source):
+    """
+    Normalized (0-1) zone polygons of a config.json `video_sources` entry.
+
+    Polygons are stored in pixels of the source's `zone_resolution`
+    ([width, height], ZONE_RESOLUTION if unset), so zone_crops can scale
+    them to whatever size the frames actually have.
+    """
+    width, height = source.get("zone_resolution", ZONE_RESOLUTION)
+    return [
+        [(x / width, y / height) for x, y in polygon]
+        for polygon in source.get("detection_zones", [])
+    ]
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _area(r):
+    return (r[2] - r[0]) * (r[3] - r[1])
+
+
+def zone_crops(zones, frame_width, frame_height, padding=ZONE_PADDING):
+    """
+    Compute the crops (x1, y1, x2, y2) that cover every zone polygon.
+
+    `zones` are normalized polygons (see source_zones), scaled here to the
+    frame size. Each polygon becomes its padded bounding box clipped to
+    the frame; overlapping boxes are merged. If the merged boxes fill most
+    of their common bounding box, that single box is returned instead so
+    the model gets one input per frame. An empty list means "use the full
+    frame", which is also returned for frames that fit the model input
+    anyway, and when a zone falls (almost) outside the frame so its crop
+    would be thinner than MIN_CROP_SIZE.
+    """
+    if frame_width <= MODEL_INPUT_SIZE and frame_height <= MODEL_INPUT_SIZE:
+        return []
+
+    rects = []
+    for polygon in zones:
+        xs = [p[0] * frame_width for p in polygon]
+        ys = [p[1] * frame_height for p in polygon]
+        x1 = max(0, int(min(xs)) - padding)
+        y1 = max(0, int(min(ys)) - padding)
+        x2 = min(frame_width, int(max(xs)) + padding)
+        y2 = min(frame_height, int(max(ys)) + padding)
+        if min(x2 - x1, y2 - y1) < MIN_CROP_SIZE:
+            print(f"⚠ Detection zone crop {(x1, y1, x2, y2)} is degenerate for a {frame_width}x{frame_height} frame, analyzing full frame")
+            return []
+        rects.append((x1, y1, x2, y2))
+
+    if not rects:
+        return []
+
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                if _overlaps(rects[i], rects[j]):
+                    rects[i] = _union(rects[i], rects.pop(j))
+                    merged = True
+                    break
+            if merged:
+                break
+
+    bounding = rects[0]
+    for r in rects[1:]:
+        bounding = _union(bounding, r)
+    if len(rects) > 1 and sum(_area(r) for r in rects) >= SINGLE_CROP_RATIO * _area(bounding):
+        rects = [bounding]
+
+    if rects == [(0, 0, frame_width, frame_height)]:
+        return []
+    return rects
+
+
+def _tile_starts(start, end, tile, step):
+    if end - start <= tile:
+        return [start]
+    count = -(-(end - start - tile) // step) + 1
+    # Spread the tiles evenly so the last one ends exactly on the edge
+    return [start + round(i * (end - start - tile) / (count - 1)) for i in range(count)]
+
+
+def tile_regions(regions, tile_size=TILE_SIZE, overlap=TILE_OVERLAP):
+    """
+    Split each region (x1, y1, x2, y2) into overlapping tiles.
+
+    Every region is kept as well, so large, nearby vehicles are still seen
+    whole; the tiles give distant, small ones more pixels at the model's
+    input size. Regions no larger than one tile are not split.
+    """
+    step = max(1, int(tile_size * (1 - overlap)))
+    tiles = []
+    for x1, y1, x2, y2 in regions:
+        tiles.append((x1, y1, x2, y2))
+        if x2 - x1 <= tile_size and y2 - y1 <= tile_size:
+            continue
+        for ty in _tile_starts(y1, y2, tile_size, step):
+            for tx in _tile_starts(x1, x2, tile_size, step):
+                tiles.append((tx, ty, min(tx + tile_size, x2), min(ty + tile_size, y2)))
+    return tiles
+
+
+def merge_tile_detections(detections, iou_threshold=TILE_MERGE_IOU, ios_threshold=TILE_MERGE_IOS):
+    """
+    Cross-tile NMS for full-frame (x1, y1, x2, y2, conf, label) detections.
+
+    Highest confidence first; a box of the same label that overlaps a kept
+    box by IoU >= iou_threshold, or lies mostly inside it (intersection over
+    the smaller box >= ios_threshold), is merged into it - the kept box
+    grows to the union, so a vehicle cut at a tile edge stays one box.
+    """
+    kept = []
+    for x1, y1, x2, y2, conf, label in sorted(detections, key=lambda d: d[4], reverse=True):
+        box = (x1, y1, x2, y2)
+        for i, (kx1, ky1, kx2, ky2, kconf, klabel) in enumerate(kept):
+            if klabel != label or not _overlaps(box, (kx1, ky1, kx2, ky2)):
+                continue
+            inter = _area((max(x1, kx1), max(y1, ky1), min(x2, kx2), min(y2, ky2)))
+            smaller = min(_area(box), _area((kx1, ky1, kx2, ky2)))
+            union = _area(box) + _area((kx1, ky1, kx2, ky2)) - inter
+            if (union and inter / union >= iou_threshold) or (smaller and inter / smaller >= ios_threshold):
+                ux1, uy1, ux2, uy2 = _union(box, (kx1, ky1, kx2, ky2))
+                kept[i] = (ux1, uy1, ux2, uy2, kconf, klabel)
+                break
+        else:
+            kept.append((x1, y1, x2, y2, conf, label))
+    return kept
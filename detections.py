@@ -0,0 +1,98 @@
+"""
+Per-frame detection records built from ultralytics results.
+
+`results.boxes.xyxy/conf/cls` are copied to the host once per result as
+contiguous NumPy arrays instead of once per box (`box.cls[0]`, ...), and
+class filtering / confidence reductions are array operations. Annotation
+and logging code iterate the compact `rows()` tuples.
+"""
+
+import numpy as np
+
+_EMPTY_BOXES = np.zeros((0, 4), dtype=np.int32)
+
+
+class FrameDetections:
+    """Boxes of one frame: xyxy (N, 4) int32, conf (N,) float32, cls (N,) int32"""
+
+    __slots__ = ("xyxy", "conf", "cls", "names")
+
+    def __init__(self, xyxy, conf, cls, names):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+
+    @classmethod
+    def from_results(cls, results, offset=(0, 0), min_conf=None):
+        """Pull all boxes of one result at once, shifted by a crop `offset`"""
+        boxes = results.boxes
+        if len(boxes) == 0:
+            return cls.empty(results.names)
+
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.int32)
+        conf = boxes.conf.cpu().numpy().astype(np.float32)
+        class_ids = boxes.cls.cpu().numpy().astype(np.int32)
+        if offset != (0, 0):
+            xyxy += np.array([offset[0], offset[1], offset[0], offset[1]], dtype=np.int32)
+
+        detections = cls(xyxy, conf, class_ids, results.names)
+        if min_conf is not None:
+            detections = detections.filter(conf > min_conf)
+        return detections
+
+    @classmethod
+    def from_rows(cls, rows, names):
+        """Build a record from (x1, y1, x2, y2, conf, label) tuples"""
+        if not rows:
+            return cls.empty(names)
+        ids = {name: class_id for class_id, name in names.items()}
+        return cls(
+            np.array([r[:4] for r in rows], dtype=np.int32),
+            np.array([r[4] for r in rows], dtype=np.float32),
+            np.array([ids[r[5]] for r in rows], dtype=np.int32),
+            names,
+        )
+
+    @classmethod
+    def empty(cls, names):
+        return cls(_EMPTY_BOXES, np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32), names)
+
+    @classmethod
+    def concat(cls, records):
+        """One record from the (non-empty list of) per-crop records of a frame"""
+        non_empty = [r for r in records if len(r)]
+        if len(non_empty) <= 1:
+            return non_empty[0] if non_empty else records[0]
+        return cls(
+            np.concatenate([r.xyxy for r in non_empty]),
+            np.concatenate([r.conf for r in non_empty]),
+            np.concatenate([r.cls for r in non_empty]),
+            non_empty[0].names,
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def filter(self, mask):
+        return FrameDetections(self.xyxy[mask], self.conf[mask], self.cls[mask], self.names)
+
+    def class_mask(self, labels):
+        """Boolean mask of the boxes whose class name is in `labels`"""
+        ids = [class_id for class_id, name in self.names.items() if name in labels]
+        return np.isin(self.cls, ids)
+
+    def best(self):
+        """(index, confidence) of the most confident box, or (None, 0.0)"""
+        if not len(self):
+            return None, 0.0
+        index = int(np.argmax(self.conf))
+        return index, float(self.conf[index])
+
+    def rows(self):
+        """[(x1, y1, x2, y2, conf, label)] with plain Python values"""
+        names = self.names
+        return [
+            (x1, y1, x2, y2, conf, names[class_id])
+            for (x1, y1, x2, y2), conf, class_id in zip(self.xyxy.tolist(), self.conf.tolist(), self.cls.tolist())
+        ]
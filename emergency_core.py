@@ -1,25 +1,54 @@
 import cv2
 import os
 import uuid
+import time
+import queue
+import shutil
 import sqlite3
-from ultralytics import YOLO
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from detection_zones import load_detection_zones, zone_crops, tile_regions, merge_tile_detections, TILE_SIZE
+from startup import LazySubsystem
+from database import db
+from inference_backends import load_detector
+from frame_sampling import AdaptiveSampler, MotionGate, MOTION_THRESHOLD, MAX_SKIP_FRAMES, IDLE_STRIDE
+from vehicle_tracker import VehicleTracker
+from detections import FrameDetections
 
 # ================= CONFIG =================
 MODEL_PATH = "runs/detect/train2/weights/best.pt"
 CONF_THRESHOLD = 0.5
 OUTPUT_DIR = "output"
 EMERGENCY_CLASSES = ["ambulance", "police", "fire brigade"]
+BATCH_SIZE = 4  # kept frames per YOLO call
+QUEUE_SIZE = 16  # frames buffered between pipeline stages (backpressure)
+IDLE_READ_AHEAD = 2  # detect-only: frames the decoder may queue ahead while the sampler is idle
+PROGRESS_EVERY = 25  # frames between progress_callback calls
+CHUNK_WORKERS = os.cpu_count() or 1  # processes for analyze_video_chunked
+MIN_CHUNK_FRAMES = 750  # don't split videos into chunks shorter than this
+EARLY_EXIT_FRAMES = 5  # confident detections of a confirmed vehicle before an early-exit analysis returns
+EARLY_EXIT_CONF = 0.7  # minimum confidence of those detections
 # =========================================
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-print("🔄 Loading YOLO model...")
-model = YOLO(MODEL_PATH)
-print("✅ Model loaded")
+def _load_model():
+    print("🔄 Loading YOLO model...")
+    # torch / onnx / openvino, per config.json models.emergency_detector.backend
+    return load_detector(MODEL_PATH)
+
+# Loaded on first inference (or startup.warm_up), not at import
+model = LazySubsystem("model", _load_model)
+
+class AnalysisCancelled(Exception):
+    """Raised by analyze_video when its cancel_event is set"""
 
 def get_active_emergency_for_junction(junction_name):
     """Get the FIRST active emergency for this specific junction"""
-    conn = sqlite3.connect("traffic_db.sqlite3")
+    conn = sqlite3.connect(db.db_path)  # first use creates the schema in this process
     cursor = conn.cursor()
     
     # Get the oldest active emergency for this junction
@@ -48,7 +77,7 @@ def get_active_emergency_for_junction(junction_name):
 
 def log_detection_db(ambulance_number, junction_name, lane_number, video_file, confidence, status):
     """Log detection to database"""
-    conn = sqlite3.connect("traffic_db.sqlite3")
+    conn = sqlite3.connect(db.db_path)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -62,7 +91,7 @@ def log_detection_db(ambulance_number, junction_name, lane_number, video_file, c
 
 def update_junction_status_db(emergency_request_id, junction_name, ambulance_number):
     """Update junction status in database"""
-    conn = sqlite3.connect("traffic_db.sqlite3")
+    conn = sqlite3.connect(db.db_path)
     cursor = conn.cursor()
     
     # Mark this specific junction as cleared
@@ -102,202 +131,107 @@ def update_junction_status_db(emergency_request_id, junction_name, ambulance_num
     conn.commit()
     conn.close()
 
-def analyze_video(video_path, junction_name="Main Square Junction"):
-    """
-    Analyze video for specific junction
-    Only processes emergency if it's scheduled for THIS junction
-    """
-    cap = cv2.VideoCapture(video_path)
+def extract_detections(results_iter, regions, tiled=False):
+    """Full-frame FrameDetections of one frame from the YOLO results of its crops"""
+    detections = FrameDetections.concat([
+        FrameDetections.from_results(next(results_iter), (x1, y1)) for x1, y1, _, _ in regions
+    ])
+    if tiled and len(detections) > 1:
+        detections = FrameDetections.from_rows(merge_tile_detections(detections.rows()), detections.names)
+    return detections
 
-    if not cap.isOpened():
-        raise Exception("❌ Could not open video")
-
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+def handle_vehicle_event(event, state, junction_name, scheduled_emergency, output_filename):
+    """Apply DB / signal side effects for one tracked emergency vehicle event
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    if fps == 0 or fps is None:
-        fps = 25
-        print("⚠ FPS was 0, using fallback:", fps)
+    With state["side_effects"] off (chunk workers) only the verdict in
+    `state` is updated; the caller replays the events later.
+    """
+    state["vehicle_events"].append(event)
 
-    output_filename = f"{uuid.uuid4().hex}.mp4"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    if event["event"] != "confirmed":
+        print(f"🚑 Track #{event['track_id']} {event['label']} {event['event']} at frame {event['frame']}")
+        # A confirmed track's best confidence keeps rising after confirmation
+        if event["event"] == "left" and event.get("confirmed"):
+            state["best_confidence"] = max(state["best_confidence"], event["confidence"])
+        return
 
-    # Browser-compatible codec
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    conf = event["confidence"]
+    state["emergency_detected"] = True
+    state["detected_class"] = event["label"]
+    state["best_confidence"] = max(state["best_confidence"], conf)
 
-    emergency_detected = False
-    detected_class = "N/A"
-    best_confidence = 0.0
-    frame_count = 0
-    
-    # Variables for this specific analysis
-    detected_ambulance_number = None
-    lane_to_clear = None
-    has_active_request = False
-    emergency_id = None
-    
-    # Get emergency scheduled for THIS junction
-    scheduled_emergency = get_active_emergency_for_junction(junction_name)
-    
+    # Check if there's a scheduled emergency for THIS junction
     if scheduled_emergency:
-        print(f"📅 Scheduled emergency at {junction_name}: Ambulance {scheduled_emergency['ambulance_number']}, Lane {scheduled_emergency['lane_number']}")
+        # This is the expected ambulance for this junction
+        state["detected_ambulance_number"] = scheduled_emergency["ambulance_number"]
+        state["lane_to_clear"] = scheduled_emergency["lane_number"]
+        state["emergency_id"] = scheduled_emergency["emergency_id"]
+        state["has_active_request"] = True
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame_count += 1
+        # Log to database
+        if state["side_effects"]:
+            log_detection_db(
+                ambulance_number=state["detected_ambulance_number"],
+                junction_name=junction_name,
+                lane_number=state["lane_to_clear"],
+                video_file=output_filename,
+                confidence=conf,
+                status="detected_with_request"
+            )
 
-        # 🔥 SPEED BOOST: skip frames
-        if frame_count % 2 != 0:
-            out.write(frame)
-            continue
+        # Clear the junction and preempt the signal once per analysis
+        if state["side_effects"] and not state["junction_cleared"]:
+            state["junction_cleared"] = True
 
-        # YOLO DETECTION
-        results = model(frame, conf=CONF_THRESHOLD, verbose=False)[0]
-
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            conf = float(box.conf[0])
-            label = results.names[cls_id]
-
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-
-            if label in EMERGENCY_CLASSES:
-                emergency_detected = True
-                detected_class = label
-                best_confidence = max(best_confidence, conf)
-                
-                # Check if there's a scheduled emergency for THIS junction
-                if scheduled_emergency:
-                    # This is the expected ambulance for this junction
-                    detected_ambulance_number = scheduled_emergency["ambulance_number"]
-                    lane_to_clear = scheduled_emergency["lane_number"]
-                    emergency_id = scheduled_emergency["emergency_id"]
-                    has_active_request = True
-                    
-                    # Log to database
-                    log_detection_db(
-                        ambulance_number=detected_ambulance_number,
-                        junction_name=junction_name,
-                        lane_number=lane_to_clear,
-                        video_file=output_filename,
-                        confidence=conf,
-                        status="detected_with_request"
-                    )
-                    
-                    # Update junction status
-                    update_junction_status_db(
-                        emergency_request_id=emergency_id,
-                        junction_name=junction_name,
-                        ambulance_number=detected_ambulance_number
-                    )
-                    
-                    # Trigger signal controller for THIS junction
-                    from signal_controller import controller
-                    controller.trigger_emergency(f"LANE_{lane_to_clear}", junction_name)
-                    
-                    color = (0, 0, 255)  # Red - scheduled emergency
-                    text = f"{label.upper()} {detected_ambulance_number} {conf:.2f}"
-                    status_text = f"SCHEDULED EMERGENCY"
-                    
-                else:
-                    # No scheduled emergency - random ambulance
-                    has_active_request = False
-                    detected_ambulance_number = f"RND{int(conf * 100):03d}"
-                    
-                    # Log as random detection
-                    log_detection_db(
-                        ambulance_number=detected_ambulance_number,
-                        junction_name=junction_name,
-                        lane_number=0,
-                        video_file=output_filename,
-                        confidence=conf,
-                        status="random_detection"
-                    )
-                    
-                    color = (255, 165, 0)  # Orange - random ambulance
-                    text = f"{label.upper()} {conf:.2f} (Random)"
-                    status_text = "RANDOM AMBULANCE"
-            else:
-                color = (0, 255, 0)  # Green - non-emergency
-                text = f"{label} {conf:.2f}"
-
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
-            cv2.putText(
-                frame,
-                text,
-                (x1, max(30, y1 - 10)),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.7,
-                color,
-                2,
+            update_junction_status_db(
+                emergency_request_id=state["emergency_id"],
+                junction_name=junction_name,
+                ambulance_number=state["detected_ambulance_number"]
             )
 
-        # Add status overlay
-        if emergency_detected:
-            if has_active_request:
-                # Scheduled emergency
-                cv2.putText(
-                    frame,
-                    f"🚨 SCHEDULED EMERGENCY",
-                    (30, 50),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (0, 0, 255),
-                    2,
-                )
-                cv2.putText(
-                    frame,
-                    f"Ambulance: {detected_ambulance_number} | Lane: {lane_to_clear}",
-                    (30, 90),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    0.8,
-                    (0, 0, 255),
-                    2,
-                )
-            else:
-                # Random ambulance
-                cv2.putText(
-                    frame,
-                    f"⚠ RANDOM AMBULANCE",
-                    (30, 50),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    1,
-                    (255, 165, 0),
-                    2,
-                )
-                cv2.putText(
-                    frame,
-                    f"No Scheduled Emergency",
-                    (30, 90),
-                    cv2.FONT_HERSHEY_DUPLEX,
-                    0.8,
-                    (255, 165, 0),
-                    2,
-                )
-            
-            cv2.putText(
-                frame,
-                f"Junction: {junction_name}",
-                (30, 130),
-                cv2.FONT_HERSHEY_DUPLEX,
-                0.8,
-                (0, 0, 255) if has_active_request else (255, 165, 0),
-                2,
+            # Trigger signal controller for THIS junction
+            state["preempt"](f"LANE_{state['lane_to_clear']}", junction_name)
+    else:
+        # No scheduled emergency - random ambulance
+        state["has_active_request"] = False
+        state["detected_ambulance_number"] = f"RND{int(conf * 100):03d}"
+
+        # Log as random detection
+        if state["side_effects"]:
+            log_detection_db(
+                ambulance_number=state["detected_ambulance_number"],
+                junction_name=junction_name,
+                lane_number=0,
+                video_file=output_filename,
+                confidence=conf,
+                status="random_detection"
             )
 
-        out.write(frame)
+    print(f"🚑 Track #{event['track_id']} {event['label']} confirmed at frame {event['frame']} ({conf:.2f})")
 
-    cap.release()
-    out.release()
+def new_analysis_state(on_preempt=None, side_effects=True):
+    """Verdict of one analysis, built up from vehicle events"""
+    return {
+        "emergency_detected": False,
+        "detected_class": "N/A",
+        "best_confidence": 0.0,
+        "detected_ambulance_number": None,
+        "lane_to_clear": None,
+        "has_active_request": False,
+        "emergency_id": None,
+        "junction_cleared": False,
+        "vehicle_events": [],
+        "last_boxes": [],  # boxes of the last inferred frame, redrawn on skipped frames
+        "preempt": on_preempt or _trigger_signal,
+        "side_effects": side_effects,
+    }
 
-    # VERIFY OUTPUT
-    size_mb = os.path.getsize(output_path) / (1024 * 1024)
-    print(f"🎬 Output video saved: {output_filename} ({size_mb:.2f} MB)")
+def _build_result(state, junction_name, output_filename, stage_timings):
+    """Public result dict of analyze_video"""
+    emergency_detected = state["emergency_detected"]
+    has_active_request = state["has_active_request"]
+    detected_ambulance_number = state["detected_ambulance_number"]
+    lane_to_clear = state["lane_to_clear"]
     
     if emergency_detected:
         if has_active_request:
@@ -309,14 +243,716 @@ def analyze_video(video_path, junction_name="Main Square Junction"):
 
     return {
         "emergency": emergency_detected,
-        "vehicle_type": detected_class if emergency_detected else "N/A",
+        "vehicle_type": state["detected_class"] if emergency_detected else "N/A",
         "ambulance_number": detected_ambulance_number if emergency_detected else "N/A",
         "junction": junction_name,
         "lane_to_clear": lane_to_clear if lane_to_clear else None,
-        "confidence": round(best_confidence, 2),
+        "confidence": round(state["best_confidence"], 2),
         "signal": f"GREEN for LANE {lane_to_clear}" if lane_to_clear else "NORMAL (Random Ambulance)",
-        "output_video": f"/output/{output_filename}",
+        "output_video": f"/output/{output_filename}" if output_filename else None,
         "has_active_request": has_active_request,
         "is_scheduled": has_active_request,
-        "message": f"Scheduled emergency processed for ambulance {detected_ambulance_number}" if has_active_request else "Random ambulance detected - no priority"
-    }
\ No newline at end of file
+        "message": f"Scheduled emergency processed for ambulance {detected_ambulance_number}" if has_active_request else "Random ambulance detected - no priority",
+        "vehicle_events": state["vehicle_events"],
+        "stage_timings": stage_timings
+    }
+
+def _early_result(state, junction_name, frame_index, seconds):
+    """
+    Result handed back by an early-exit analysis while annotation continues.
+
+    Returned once the junction is cleared and a confirmed vehicle has
+    `confirm_frames` detections of at least `confirm_conf`, so a weak
+    sighting still preempts but does not cut the analysis short. The rest
+    of the clip is annotated on a background thread, so the result has
+    `annotation_pending: True` and no `output_video`. With `on_early_result`
+    it goes to that callback and analyze_video returns the complete result.
+    """
+    print(f"⏩ Scheduled emergency confirmed at frame {frame_index} after {seconds:.2f}s, returning early")
+    result = _build_result(state, junction_name, None, {
+        "early_exit": True,
+        "settled_at_frame": frame_index,
+        "seconds_to_verdict": round(seconds, 3),
+    })
+    result["vehicle_events"] = list(state["vehicle_events"])
+    result["annotation_pending"] = True
+    return result
+
+def _trigger_signal(lane, junction_name):
+    """Default preemption hook: drive this process's signal controller"""
+    from signal_controller import controller
+    controller.trigger_emergency(lane, junction_name)
+
+def process_detections(frame, frame_index, detections, tracker, state, junction_name, scheduled_emergency, output_filename, annotate=True):
+    """Track emergency vehicles, apply their events and annotate one frame.
+
+    `detections` is the frame's FrameDetections. Side effects (DB writes,
+    signal preemption) only happen on tracker events, not per box.
+    The drawn boxes are kept in state["last_boxes"] for redraw_last_overlay.
+    Returns True if the frame contained an emergency-class box.
+    """
+    emergency_mask = detections.class_mask(EMERGENCY_CLASSES)
+    emergency_detections = detections.filter(emergency_mask).rows()
+    tracks, events = tracker.update(frame_index, emergency_detections)
+    for event in events:
+        handle_vehicle_event(event, state, junction_name, scheduled_emergency, output_filename)
+    if not annotate:
+        return bool(emergency_detections)
+
+    # Other vehicles first, so emergency boxes are drawn on top
+    boxes = [(d, None) for d in detections.filter(~emergency_mask).rows()]
+    boxes.extend((d, track.track_id) for d, track in zip(emergency_detections, tracks))
+    state["last_boxes"] = boxes
+
+    _draw_boxes(frame, boxes, scheduled_emergency)
+    _draw_status_overlay(frame, state, junction_name)
+    return bool(emergency_detections)
+
+def redraw_last_overlay(frame, state, junction_name, scheduled_emergency):
+    """Draw the last inferred frame's boxes and the banner on a frame that skipped YOLO"""
+    _draw_boxes(frame, state["last_boxes"], scheduled_emergency)
+    _draw_status_overlay(frame, state, junction_name)
+
+def _draw_boxes(frame, boxes, scheduled_emergency):
+    """Draw ((x1, y1, x2, y2, conf, label), track_id or None) boxes"""
+    for (x1, y1, x2, y2, conf, label), track_id in boxes:
+        if track_id is not None:
+            if scheduled_emergency:
+                color = (0, 0, 255)  # Red - scheduled emergency
+                text = f"{label.upper()} #{track_id} {scheduled_emergency['ambulance_number']} {conf:.2f}"
+            else:
+                color = (255, 165, 0)  # Orange - random ambulance
+                text = f"{label.upper()} #{track_id} {conf:.2f} (Random)"
+        else:
+            color = (0, 255, 0)  # Green - non-emergency
+            text = f"{label} {conf:.2f}"
+
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+        cv2.putText(
+            frame,
+            text,
+            (x1, max(30, y1 - 10)),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.7,
+            color,
+            2,
+        )
+
+def _draw_status_overlay(frame, state, junction_name):
+    """Draw the scheduled/random emergency banner once an emergency was seen"""
+    if not state["emergency_detected"]:
+        return
+
+    if state["has_active_request"]:
+        # Scheduled emergency
+        cv2.putText(
+            frame,
+            f"🚨 SCHEDULED EMERGENCY",
+            (30, 50),
+            cv2.FONT_HERSHEY_DUPLEX,
+            1,
+            (0, 0, 255),
+            2,
+        )
+        cv2.putText(
+            frame,
+            f"Ambulance: {state['detected_ambulance_number']} | Lane: {state['lane_to_clear']}",
+            (30, 90),
+            cv2.FONT_HERSHEY_DUPLEX,
+            0.8,
+            (0, 0, 255),
+            2,
+        )
+    else:
+        # Random ambulance
+        cv2.putText(
+            frame,
+            f"⚠ RANDOM AMBULANCE",
+            (30, 50),
+            cv2.FONT_HERSHEY_DUPLEX,
+            1,
+            (255, 165, 0),
+            2,
+        )
+        cv2.putText(
+            frame,
+            f"No Scheduled Emergency",
+            (30, 90),
+            cv2.FONT_HERSHEY_DUPLEX,
+            0.8,
+            (255, 165, 0),
+            2,
+        )
+    
+    cv2.putText(
+        frame,
+        f"Junction: {junction_name}",
+        (30, 130),
+        cv2.FONT_HERSHEY_DUPLEX,
+        0.8,
+        (0, 0, 255) if state["has_active_request"] else (255, 165, 0),
+        2,
+    )
+
+def _queue_put(q, item, stop_event):
+    """Blocking put that gives up once the pipeline is being torn down"""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _decode_frames(cap, frame_queue, sampler, gate, timings, stop_event, start_frame=0, end_frame=None, grab_only=False):
+    """Decoder stage: read frames, pick the ones to infer and queue (index, frame, run_inference)
+
+    An AdaptiveSampler takes every `idle_stride`-th frame until an
+    emergency is seen, then every frame; outside that window a MotionGate
+    also drops frames that barely changed since the last inferred one.
+    With `grab_only` (detect-only analysis) frames off the sampler stride
+    are grabbed but never decoded to BGR, and only frames that go to the
+    model are queued with their pixels. Those frames cannot be inferred
+    later, so while the sampler is idle the decoder stays at most
+    IDLE_READ_AHEAD frames ahead and picks up an active stride at once.
+    """
+    frame_index = start_frame
+    try:
+        while not stop_event.is_set() and (end_frame is None or frame_index < end_frame):
+            if grab_only:
+                while (not sampler.active and frame_queue.qsize() >= IDLE_READ_AHEAD
+                       and not stop_event.is_set()):
+                    time.sleep(0.001)
+
+            start = time.perf_counter()
+            ret = cap.grab()
+            sampled = ret and sampler.should_sample(frame_index + 1)
+            frame = None
+            if ret and (sampled or not grab_only):
+                ret, frame = cap.retrieve()
+            timings["decode"] += time.perf_counter() - start
+            if not ret:
+                break
+            timings["decoded_frames"] += 1
+            frame_index += 1
+
+            start = time.perf_counter()
+            # No motion gate while an emergency vehicle is in view: a slow or
+            # stopped ambulance still has to reach the tracker's confirm hits
+            run_inference = sampled and (sampler.active or gate.should_infer(frame, frame_index))
+            timings["motion"] += time.perf_counter() - start
+            if grab_only and not run_inference:
+                frame = None  # nothing to annotate or encode
+
+            if not _queue_put(frame_queue, (frame_index, frame, run_inference), stop_event):
+                break
+    finally:
+        _queue_put(frame_queue, None, stop_event)
+
+def _encode_frames(out, encode_queue, timings):
+    """Encoder stage: write annotated frames until the end-of-stream marker"""
+    while True:
+        frame = encode_queue.get()
+        if frame is None:
+            break
+        start = time.perf_counter()
+        out.write(frame)
+        timings["encode"] += time.perf_counter() - start
+        timings["encoded_frames"] += 1
+
+def _report_stage_timings(timings, wall_time, frames=None):
+    """Summarize per-stage busy time; the busiest stage limits throughput
+
+    `frames` overrides the decoded frame count when the analysis consumed
+    fewer frames than the decoder had read ahead.
+    """
+    if frames is None:
+        frames = timings["decoded_frames"]
+    report = {
+        "wall_seconds": round(wall_time, 3),
+        "frames": frames,
+        "inferred_frames": timings["inferred_frames"],
+        "fps": round(frames / wall_time, 2) if wall_time > 0 else 0.0,
+        "stages": {},
+    }
+    for stage in ("decode", "motion", "inference", "annotate", "encode"):
+        report["stages"][stage] = {
+            "seconds": round(timings[stage], 3),
+            "ms_per_frame": round(1000 * timings[stage] / max(1, frames), 2),
+        }
+    report["bottleneck"] = max(report["stages"], key=lambda s: report["stages"][s]["seconds"])
+
+    print(f"⏱ Pipeline: {report['frames']} frames in {report['wall_seconds']}s ({report['fps']} FPS), bottleneck: {report['bottleneck']}")
+    for stage, stats in report["stages"].items():
+        print(f"   {stage:<10} {stats['seconds']:>8.3f}s  {stats['ms_per_frame']:>7.2f} ms/frame")
+    return report
+
+def _release_capture(cap, out, output_path, completed):
+    """Release the capture and writer; an analysis that did not complete leaves no partial output"""
+    cap.release()
+    if out is not None:
+        out.release()
+        if not completed and os.path.exists(output_path):
+            os.remove(output_path)
+
+def analyze_video(video_path, junction_name="Main Square Junction", batch_size=BATCH_SIZE,
+                  motion_threshold=MOTION_THRESHOLD, max_skip_frames=MAX_SKIP_FRAMES,
+                  idle_stride=IDLE_STRIDE, camera=None, progress_callback=None,
+                  cancel_event=None, on_preempt=None, start_frame=0, end_frame=None,
+                  output_path=None, side_effects=True, detect_only=False,
+                  early_exit=False, confirm_frames=EARLY_EXIT_FRAMES, confirm_conf=EARLY_EXIT_CONF,
+                  on_early_result=None, tiled=False, tile_size=TILE_SIZE):
+    """
+    Analyze video for specific junction
+    Only processes emergency if it's scheduled for THIS junction
+
+    Decode, YOLO (`batch_size` frames per call) and encode run as a threaded
+    pipeline; _decode_frames picks the frames that reach the model.
+
+    - default: annotated output video, DB logging and signal preemption
+    - `camera`: infer on its config.json detection-zone crops (detection_zones.zone_crops)
+    - `tiled`: split each input into overlapping tiles (detection_zones.tile_regions)
+    - `start_frame`/`end_frame`/`output_path`/`side_effects=False`: one chunk (replay_vehicle_events)
+    - `detect_only`: verdict only, no video; stops at the first confirmed vehicle
+    - `early_exit`: return once a scheduled emergency is confirmed (_early_result)
+
+    `cancel_event` raises AnalysisCancelled; a cancelled or failed run deletes its partial output.
+    """
+    cap = cv2.VideoCapture(video_path)
+
+    out = None
+    try:
+        if not cap.isOpened():
+            raise Exception("❌ Could not open video")
+
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if fps == 0 or fps is None:
+            fps = 25
+            print("⚠ FPS was 0, using fallback:", fps)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        if end_frame is not None:
+            total_frames = min(total_frames, end_frame)
+        total_frames = max(0, total_frames - start_frame)
+
+        if detect_only:
+            # No annotated video; detections are logged against the input clip
+            output_filename = os.path.basename(video_path)
+            out = None
+        elif output_path is None:
+            output_filename = f"{uuid.uuid4().hex}.mp4"
+            output_path = os.path.join(OUTPUT_DIR, output_filename)
+        else:
+            output_filename = os.path.basename(output_path)
+
+        if not detect_only:
+            # Browser-compatible codec
+            fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+
+        frame_count = 0
+        batch_size = max(1, int(batch_size))
+
+        # Region-of-interest crops for this camera (full frame if none configured)
+        regions = zone_crops(load_detection_zones(camera), width, height) or [(0, 0, width, height)]
+        if camera:
+            print(f"🔲 {camera}: inference on {len(regions)} crop(s) {regions}")
+        if tiled:
+            regions = tile_regions(regions, tile_size)
+            print(f"🧩 Tiled inference: {len(regions)} input(s) per frame")
+    
+        # Get emergency scheduled for THIS junction
+        scheduled_emergency = get_active_emergency_for_junction(junction_name)
+    
+        if scheduled_emergency:
+            print(f"📅 Scheduled emergency at {junction_name}: Ambulance {scheduled_emergency['ambulance_number']}, Lane {scheduled_emergency['lane_number']}")
+
+        # Early exit only pays off when a confirmation preempts a signal
+        early_exit = bool(early_exit and scheduled_emergency and side_effects and not detect_only)
+
+        # Variables for this specific analysis
+        state = new_analysis_state(on_preempt, side_effects)
+        tracker = VehicleTracker(settle_conf=confirm_conf)
+
+        # Busy time per stage; each key is only written by its own stage
+        timings = {
+            "decode": 0.0, "motion": 0.0, "inference": 0.0, "annotate": 0.0, "encode": 0.0,
+            "decoded_frames": 0, "inferred_frames": 0, "encoded_frames": 0,
+        }
+        frame_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        encode_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        stop_event = threading.Event()
+        sampler = AdaptiveSampler(idle_stride=idle_stride)
+        gate = MotionGate(threshold=motion_threshold, max_skip=max_skip_frames)
+
+        decoder = threading.Thread(
+            target=_decode_frames,
+            args=(cap, frame_queue, sampler, gate, timings, stop_event, start_frame, end_frame, detect_only),
+            daemon=True
+        )
+        encoder = threading.Thread(
+            target=_encode_frames, args=(out, encode_queue, timings), daemon=True
+        )
+    except BaseException:
+        # Setup failed before the pipeline took over the capture and writer
+        _release_capture(cap, out, output_path, completed=False)
+        raise
+
+    # Frames waiting for the current batch, in video order: (index, frame, run_inference)
+    pending = []
+    batch_frames = []
+    # Detect-only: index of the frame whose confirmation settled the verdict
+    settled_frame = None
+
+    def flush_batch():
+        nonlocal settled_frame
+
+        # YOLO DETECTION (one call for every crop of every frame in the batch)
+        start = time.perf_counter()
+        inputs = [frame[y1:y2, x1:x2] for frame in batch_frames for x1, y1, x2, y2 in regions]
+        batch_results = model(inputs, conf=CONF_THRESHOLD, verbose=False) if inputs else []
+        timings["inference"] += time.perf_counter() - start
+        timings["inferred_frames"] += len(batch_frames)
+        results_iter = iter(batch_results)
+
+        for frame_index, frame, run_inference in pending:
+            if run_inference:
+                start = time.perf_counter()
+                detections = extract_detections(results_iter, regions, tiled)
+                emergency_in_frame = process_detections(
+                    frame, frame_index, detections, tracker, state,
+                    junction_name, scheduled_emergency, output_filename,
+                    annotate=not detect_only
+                )
+                timings["annotate"] += time.perf_counter() - start
+                # Ramp the sampler up while an emergency vehicle is in view
+                sampler.update(frame_index, emergency_in_frame)
+                if detect_only and state["emergency_detected"]:
+                    # The verdict cannot change, later frames stay unconsumed
+                    settled_frame = frame_index
+                    break
+            elif not detect_only:
+                # Keep boxes and banner steady between inferred frames
+                start = time.perf_counter()
+                redraw_last_overlay(frame, state, junction_name, scheduled_emergency)
+                timings["annotate"] += time.perf_counter() - start
+            if not detect_only:
+                encode_queue.put(frame)
+
+        pending.clear()
+        batch_frames.clear()
+
+    wall_start = time.perf_counter()
+    decoder.start()
+    if not detect_only:
+        encoder.start()
+
+    # Early exit hand-off between the pipeline and this call
+    settled = threading.Event()
+    outcome = {}
+
+    def run_pipeline():
+        nonlocal frame_count
+
+        cancelled = False
+        stopped_early = False
+        try:
+            while True:
+                item = frame_queue.get()
+                if item is None:
+                    break
+
+                if cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                    break
+
+                frame_index, frame, run_inference = item
+                frame_count += 1
+
+                # The decoder picked the stride up to QUEUE_SIZE frames ahead;
+                # once an emergency is in view, infer every frame it decoded
+                if not run_inference and frame is not None and sampler.active:
+                    run_inference = True
+
+                if progress_callback and frame_count % PROGRESS_EVERY == 0:
+                    progress_callback(frame_count, total_frames)
+
+                # 🔥 SPEED BOOST: off-stride and static frames skip YOLO
+                pending.append((frame_index, frame, run_inference))
+                if run_inference:
+                    batch_frames.append(frame)
+
+                # Flush on a full batch, or when too many skipped frames are held
+                # back (bounds memory and the sampler's feedback delay). While
+                # the sampler is idle each inferred frame is flushed at once, so
+                # a first emergency box ramps the stride up without delay
+                if (len(batch_frames) >= batch_size or len(pending) >= QUEUE_SIZE
+                        or (run_inference and not sampler.active)):
+                    flush_batch()
+
+                    # Detect-only: a confirmed vehicle settles the verdict
+                    if settled_frame is not None:
+                        break
+
+                    # Early exit: hand the verdict back, keep annotating here
+                    if (early_exit and state["junction_cleared"] and not settled.is_set()
+                            and tracker.settled_hits >= confirm_frames):
+                        outcome["early"] = _early_result(
+                            state, junction_name, frame_index,
+                            time.perf_counter() - wall_start
+                        )
+                        settled.set()
+                        if on_early_result is not None:
+                            on_early_result(outcome["early"])
+
+            if not cancelled:
+                flush_batch()
+                if settled_frame is not None:
+                    # Frames the decoder read past the settling frame were never consumed
+                    stopped_early = True
+                    frame_count = settled_frame - start_frame
+
+            # Vehicles still in view at the end of the clip leave here; a
+            # detect-only run that stopped early never saw them leave
+            if not cancelled and not stopped_early:
+                for event in tracker.finish(start_frame + frame_count):
+                    handle_vehicle_event(event, state, junction_name, scheduled_emergency, output_filename)
+        finally:
+            stop_event.set()
+            decoder.join()
+            if not detect_only:
+                encode_queue.put(None)
+                encoder.join()
+
+        if cancelled:
+            raise AnalysisCancelled(f"Analysis of {video_path} cancelled at frame {frame_count}")
+
+        if progress_callback:
+            progress_callback(frame_count, total_frames)
+
+        stage_timings = _report_stage_timings(
+            timings, time.perf_counter() - wall_start, frame_count if stopped_early else None
+        )
+        stage_timings["sampler"] = sampler.stats()
+        stage_timings["motion_gate"] = gate.stats()
+        if "early" in outcome:
+            stage_timings.update(outcome["early"]["stage_timings"])
+        print(f"🎞 Sampled {sampler.sampled}/{frame_count} frames, motion gate skipped {gate.skipped} of them")
+
+        if detect_only:
+            stage_timings["detect_only"] = True
+            stage_timings["stopped_early_at"] = settled_frame if stopped_early else None
+            if stopped_early:
+                print(f"⏩ Verdict settled at frame {settled_frame}, skipped the rest of the clip")
+            return _build_result(state, junction_name, None, stage_timings)
+
+        out.release()
+
+        # VERIFY OUTPUT
+        size_mb = os.path.getsize(output_path) / (1024 * 1024)
+        print(f"🎬 Output video saved: {output_filename} ({size_mb:.2f} MB)")
+
+        return _build_result(state, junction_name, output_filename, stage_timings)
+
+    def run():
+        # Capture and writer are released however the pipeline ends; a run
+        # that does not complete (cancelled or failed) leaves no partial output
+        completed = False
+        try:
+            result = run_pipeline()
+            completed = True
+            return result
+        finally:
+            _release_capture(cap, out, output_path, completed)
+
+    if not early_exit or on_early_result is not None:
+        return run()
+
+    # Early exit: the pipeline continues on a non-daemon thread so the
+    # output video is still completed after this call returns
+    def run_in_background():
+        try:
+            outcome["result"] = run()
+        except Exception as e:
+            outcome["error"] = e
+            if "early" in outcome:
+                print(f"❌ Background annotation of {video_path} failed: {e}")
+        finally:
+            settled.set()
+
+    threading.Thread(target=run_in_background, name=f"annotate-{output_filename}").start()
+    settled.wait()
+
+    if "early" in outcome:
+        return outcome["early"]
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["result"]
+
+def _analyze_chunk(args):
+    """Worker-process entry point of analyze_video_chunked: one frame range, no side effects"""
+    video_path, junction_name, camera, start_frame, end_frame, segment_path = args
+    return analyze_video(
+        video_path,
+        junction_name,
+        camera=camera,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        output_path=segment_path,
+        side_effects=False,
+    )
+
+def _concat_segments(segment_paths, output_path, fps, size):
+    """
+    Join the annotated chunk videos into one output and delete the parts.
+
+    With ffmpeg available the segments are stream-copied (concat demuxer,
+    no decode or second lossy encode); otherwise they are decoded and
+    re-encoded here, which is serial. Returns "copy" or "reencode".
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        handle, list_path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(handle, "w") as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        try:
+            subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                 "-i", list_path, "-c", "copy", output_path],
+                check=True, capture_output=True,
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"⚠ ffmpeg concat failed, re-encoding instead: {e.stderr.decode(errors='replace').strip()}")
+        else:
+            for path in segment_paths:
+                os.remove(path)
+            return "copy"
+        finally:
+            os.remove(list_path)
+
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    out = cv2.VideoWriter(output_path, fourcc, fps, size)
+    for path in segment_paths:
+        cap = cv2.VideoCapture(path)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            out.write(frame)
+        cap.release()
+        os.remove(path)
+    out.release()
+    return "reencode"
+
+def _merge_stage_timings(chunk_timings, wall_time):
+    """Sum per-stage busy time over chunks; fps is measured on the parent's wall clock"""
+    merged = {
+        "wall_seconds": round(wall_time, 3),
+        "frames": sum(t["frames"] for t in chunk_timings),
+        "inferred_frames": sum(t["inferred_frames"] for t in chunk_timings),
+        "chunks": len(chunk_timings),
+        "stages": {},
+    }
+    merged["fps"] = round(merged["frames"] / wall_time, 2) if wall_time > 0 else 0.0
+    for stage in chunk_timings[0]["stages"]:
+        seconds = sum(t["stages"][stage]["seconds"] for t in chunk_timings)
+        merged["stages"][stage] = {
+            "seconds": round(seconds, 3),
+            "ms_per_frame": round(1000 * seconds / max(1, merged["frames"]), 2),
+        }
+    merged["bottleneck"] = max(merged["stages"], key=lambda s: merged["stages"][s]["seconds"])
+    return merged
+
+def analyze_video_chunked(video_path, junction_name="Main Square Junction", workers=CHUNK_WORKERS,
+                          camera=None, on_preempt=None):
+    """
+    Analyze a long video by splitting it into frame ranges that run in
+    parallel worker processes, each with its own YOLO instance.
+
+    Chunks are analyzed without side effects; their annotated segments are
+    concatenated into one output and their vehicle events are replayed here
+    in frame order, so DB logging and signal preemption happen exactly as
+    in analyze_video and the result has the same schema. A vehicle that
+    is in view across a chunk boundary shows up as two tracks.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception("❌ Could not open video")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    cap.release()
+
+    n_chunks = min(workers, total_frames // MIN_CHUNK_FRAMES)
+    if n_chunks < 2:
+        return analyze_video(video_path, junction_name, camera=camera, on_preempt=on_preempt)
+
+    output_filename = f"{uuid.uuid4().hex}.mp4"
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
+
+    bounds = [i * total_frames // n_chunks for i in range(n_chunks)] + [None]
+    chunks = [
+        (video_path, junction_name, camera, bounds[i], bounds[i + 1], f"{output_path}.part{i}.mp4")
+        for i in range(n_chunks)
+    ]
+    print(f"🧩 Splitting {total_frames} frames into {n_chunks} chunks")
+
+    wall_start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    completed = False
+    try:
+        with ProcessPoolExecutor(max_workers=n_chunks, mp_context=context) as pool:
+            chunk_results = list(pool.map(_analyze_chunk, chunks))
+
+        start = time.perf_counter()
+        concat_mode = _concat_segments([c[5] for c in chunks], output_path, fps, (width, height))
+        concat_seconds = time.perf_counter() - start
+        completed = True
+    finally:
+        if not completed:
+            # Segments of chunks that finished before the failure, and any partial output
+            for path in [c[5] for c in chunks] + [output_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # Renumber the chunks' tracks so IDs stay unique in the merged event list
+    vehicle_events = []
+    track_offset = 0
+    for chunk in chunk_results:
+        events = chunk["vehicle_events"]
+        vehicle_events.extend(dict(e, track_id=e["track_id"] + track_offset) for e in events)
+        track_offset += max((e["track_id"] for e in events), default=0)
+
+    stage_timings = _merge_stage_timings(
+        [c["stage_timings"] for c in chunk_results], time.perf_counter() - wall_start
+    )
+    # wall_seconds / fps above already include this serial step
+    stage_timings["concat_seconds"] = round(concat_seconds, 3)
+    stage_timings["concat_mode"] = concat_mode
+    print(f"🎬 Output video saved: {output_filename} ({stage_timings['fps']} FPS over {n_chunks} chunks)")
+
+    return replay_vehicle_events(vehicle_events, junction_name, output_filename, stage_timings, on_preempt)
+
+def replay_vehicle_events(vehicle_events, junction_name, output_filename, stage_timings=None, on_preempt=None):
+    """
+    Apply previously recorded vehicle events to `junction_name` and build
+    the analyze_video result for them.
+
+    Used for merged chunk results (chunks run with `side_effects=False`)
+    and for cache hits: the junction's scheduled emergency is looked up
+    now, so DB logging and preemption reflect the current state rather
+    than that of the original analysis.
+    """
+    scheduled_emergency = get_active_emergency_for_junction(junction_name)
+    state = new_analysis_state(on_preempt)
+    for event in vehicle_events:
+        handle_vehicle_event(event, state, junction_name, scheduled_emergency, output_filename)
+    return _build_result(state, junction_name, output_filename, stage_timings or {})
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""
+Server-Sent Events push channel for dashboards.
+
+Signal phase changes (from the controller) and emergency lifecycle
+changes (created, junction cleared, completed) are published as deltas
+to every connected client of `GET /events`, so the React pages no longer
+have to poll.
+
+Events are kept, already in SSE wire format, in a ring buffer of the last
+EVENT_BACKLOG events. A client only holds the ID of the last event it was
+sent, so a slow client never blocks the publishers or other clients.
+If it falls behind by more than the buffer, or reconnects with a
+Last-Event-ID that is no longer buffered (or from before a restart), it
+gets a fresh `snapshot` event and continues from there.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+
+# ================= CONFIG =================
+EVENT_BACKLOG = 2000            # events kept for resuming clients
+# Concurrent /events streams per process. Each one holds a server thread, so
+# keep this well below the gunicorn thread count (see Dockerfile)
+MAX_CLIENTS = int(os.environ.get("MAX_EVENT_CLIENTS", 200))
+HEARTBEAT_SECONDS = 15          # idle comment so proxies keep the stream open
+FLUSH_INTERVAL = 0.25           # per-client pause that coalesces bursts into one write
+RETRY_MS = 3000                 # browser reconnect delay
+EMERGENCY_POLL_INTERVAL = 1.0   # seconds between emergency table checks
+# =========================================
+
+
+class TooManyClients(Exception):
+    """Raised by EventHub.stream() when MAX_CLIENTS streams are open"""
+
+
+class EventHub:
+    """
+    Ring buffer of pre-serialized events plus the per-client stream loop.
+
+    Started on the first subscriber: it then registers with the signal
+    controller and starts the emergency watcher, so a process nobody
+    streams from does no extra work.
+    """
+
+    def __init__(self, backlog=EVENT_BACKLOG, max_clients=MAX_CLIENTS):
+        # IDs are "<epoch>:<n>"; the epoch tells a resume after a restart apart
+        self.epoch = format(int(time.time() * 1000), "x")
+        self.max_clients = max_clients
+        self.clients = 0
+        self._events = deque(maxlen=backlog)  # (n, payload bytes)
+        self._last = 0
+        self._cond = threading.Condition()
+        self._started = False
+
+    def _start(self):
+        from signal_controller import controller
+
+        controller.add_listener(self._signal_changed)
+        threading.Thread(target=self._watch_emergencies, daemon=True).start()
+        print("📡 Event stream started")
+
+    # ---------------- publishing ----------------
+
+    def publish(self, event_type, data):
+        """Publish a JSON-serializable delta to all clients"""
+        self.publish_raw(event_type, json.dumps(data).encode())
+
+    def publish_raw(self, event_type, data_json):
+        with self._cond:
+            self._last += 1
+            payload = b"id: %s:%d\nevent: %s\ndata: %s\n\n" % (
+                self.epoch.encode(), self._last, event_type.encode(), data_json
+            )
+            self._events.append((self._last, payload))
+            self._cond.notify_all()
+
+    def _signal_changed(self, junction_name, snapshot):
+        # Called under the controller lock: reuse the snapshot's serialized status
+        if snapshot is None:
+            self.publish("junction_removed", {"junction": junction_name})
+            return
+        self.publish_raw("signal", b'{"junction": %s, "version": %d, "status": %s}' % (
+            json.dumps(junction_name).encode(), snapshot.version, snapshot.summary_json
+        ))
+
+    def _watch_emergencies(self):
+        """
+        Diff the active emergencies against the previous check.
+
+        Junctions are cleared by analysis worker processes and emergencies
+        are created or cleared through several routes, so the database is
+        the one place that sees all of them. One query per interval per
+        process replaces one per open dashboard.
+        """
+        from database import db
+
+        known = None
+        while True:
+            try:
+                active = {e["id"]: e for e in db.get_active_emergencies()}
+            except Exception as e:
+                print(f"⚠ Emergency watcher query failed: {e}")
+                time.sleep(EMERGENCY_POLL_INTERVAL)
+                continue
+
+            if known is not None:
+                for emergency_id, emergency in active.items():
+                    before = known.get(emergency_id)
+                    if before is None:
+                        self.publish("emergency_created", emergency)
+                        continue
+                    pending = {j["junction_name"] for j in emergency["pending_junctions"]}
+                    for junction in before["pending_junctions"]:
+                        if junction["junction_name"] not in pending:
+                            self.publish("junction_cleared", {
+                                "id": emergency_id,
+                                "ambulance_number": emergency["ambulance_number"],
+                                "junction_name": junction["junction_name"],
+                                "lane_number": junction["lane_number"],
+                                "current_junction_index": emergency["current_junction_index"],
+                                "total_junctions": emergency["total_junctions"],
+                            })
+                for emergency_id, emergency in known.items():
+                    if emergency_id not in active:
+                        self.publish("emergency_completed", {
+                            "id": emergency_id,
+                            "ambulance_number": emergency["ambulance_number"],
+                        })
+            known = active
+            time.sleep(EMERGENCY_POLL_INTERVAL)
+
+    # ---------------- reading ----------------
+
+    def _cursor(self, last_event_id):
+        """Buffer position to resume after, or None if a snapshot is needed"""
+        epoch, _, n = (last_event_id or "").partition(":")
+        if epoch != self.epoch or not n.isdigit():
+            return None
+        n = int(n)
+        with self._cond:
+            oldest = self._events[0][0] if self._events else self._last + 1
+            if n > self._last or n < oldest - 1:
+                return None
+        return n
+
+    def _wait(self, cursor, timeout):
+        """Payloads after `cursor` as (new cursor, payloads); payloads is None on overflow"""
+        with self._cond:
+            if self._last <= cursor:
+                self._cond.wait(timeout)
+            if self._last <= cursor:
+                return cursor, []
+            if cursor < self._events[0][0] - 1:
+                return self._last, None  # fell further behind than the backlog
+
+            payloads = []
+            for n, payload in reversed(self._events):
+                if n <= cursor:
+                    break
+                payloads.append(payload)
+            payloads.reverse()
+            return self._last, payloads
+
+    def _snapshot(self):
+        """Full state as a `snapshot` event, tagged with the current newest ID"""
+        from signal_controller import controller
+        from database import db
+
+        with self._cond:
+            cursor = self._last
+        data = json.dumps({
+            "junctions": controller.get_all_junctions_status(),
+            "emergencies": db.get_active_emergencies(),
+        }).encode()
+        payload = b"id: %s:%d\nevent: snapshot\ndata: %s\n\n" % (self.epoch.encode(), cursor, data)
+        return cursor, payload
+
+    def stream(self, last_event_id=None):
+        """
+        Generator of SSE chunks for one client, and a function releasing its slot.
+
+        Raises TooManyClients if the process is full. The slot is taken
+        here, under the same lock as the check, and released when the
+        generator ends; the caller also calls `release` when the response
+        closes, which covers a generator that never started. Releasing
+        twice is harmless.
+        """
+        with self._cond:
+            if self.clients >= self.max_clients:
+                raise TooManyClients(f"{self.clients} event streams already open")
+            self.clients += 1
+            start = not self._started
+            self._started = True
+        if start:
+            self._start()
+
+        held = [True]
+
+        def release():
+            with self._cond:
+                if held[0]:
+                    held[0] = False
+                    self.clients -= 1
+
+        def chunks():
+            try:
+                yield b"retry: %d\n\n" % RETRY_MS
+                cursor = self._cursor(last_event_id)
+                if cursor is None:
+                    cursor, payload = self._snapshot()
+                    yield payload
+
+                while True:
+                    cursor, payloads = self._wait(cursor, HEARTBEAT_SECONDS)
+                    if payloads is None:
+                        cursor, payload = self._snapshot()
+                        yield payload
+                    elif payloads:
+                        yield b"".join(payloads)
+                    else:
+                        yield b": keepalive\n\n"
+                    # A slow client simply blocks in the write above; sleeping
+                    # here batches whatever arrives meanwhile into one write
+                    time.sleep(FLUSH_INTERVAL)
+            finally:
+                release()
+
+        return chunks(), release
+
+    def metrics(self):
+        with self._cond:
+            return {"clients": self.clients, "last_event": f"{self.epoch}:{self._last}", "buffered": len(self._events)}
+
+
+# Global instance
+events = EventHub()
@@ -0,0 +1,124 @@
+import cv2
+
+# ================= CONFIG =================
+MOTION_THRESHOLD = 0.002    # fraction of changed pixels that counts as motion
+MOTION_PIXEL_DELTA = 25     # per-pixel grey level change that counts as "changed"
+MAX_SKIP_FRAMES = 25        # always run inference at least this often (in video frames)
+GATE_WIDTH = 160            # width of the downscaled grayscale copy
+IDLE_STRIDE = 8             # sample every Nth frame while no emergency is seen
+ACTIVE_STRIDE = 1           # sample every frame while an emergency is in view
+HOLD_FRAMES = 50            # keep the active stride this long after the last sighting
+# =========================================
+
+
+class MotionGate:
+    """
+    Cheap frame-differencing gate in front of YOLO.
+
+    Each frame is downscaled to GATE_WIDTH, converted to grayscale and
+    compared with the last frame that was sent to the model. Inference is
+    skipped while the changed-pixel fraction stays under `threshold`, but
+    never for more than `max_skip` video frames in a row so a slow-moving
+    vehicle is still picked up. The limit is counted on frame indices, not
+    on calls, so it holds whatever stride the sampler in front runs at.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, max_skip=MAX_SKIP_FRAMES,
+                 pixel_delta=MOTION_PIXEL_DELTA, width=GATE_WIDTH):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.reference = None
+        self.reference_index = None
+        self.inferred = 0
+        self.skipped = 0
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_infer(self, frame, frame_index):
+        """Return True when the frame differs enough from the last inferred one"""
+        if self.threshold is None:
+            self.inferred += 1
+            return True
+
+        gray = self._small_gray(frame)
+
+        if self.reference is None or frame_index - self.reference_index >= self.max_skip:
+            run = True
+        else:
+            diff = cv2.absdiff(gray, self.reference)
+            changed = (diff > self.pixel_delta).mean()
+            run = changed >= self.threshold
+
+        if run:
+            self.reference = gray
+            self.reference_index = frame_index
+            self.inferred += 1
+        else:
+            self.skipped += 1
+        return run
+
+    def stats(self):
+        total = self.inferred + self.skipped
+        return {
+            "inferred": self.inferred,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / total, 3) if total else 0.0,
+        }
+
+
+class AdaptiveSampler:
+    """
+    Frame stride driven by detection state.
+
+    Samples every `idle_stride` frames while nothing interesting is in
+    view. As soon as `update()` reports an emergency-class box the stride
+    drops to `active_stride`; once no emergency has been seen for
+    `hold_frames` frames it doubles on each sampled frame until it is back
+    at `idle_stride`. While `active`, callers should also bypass the
+    MotionGate so a slow or stopped vehicle is inferred on every frame.
+    """
+
+    def __init__(self, idle_stride=IDLE_STRIDE, active_stride=ACTIVE_STRIDE, hold_frames=HOLD_FRAMES):
+        self.idle_stride = max(1, idle_stride)
+        self.active_stride = max(1, active_stride)
+        self.hold_frames = hold_frames
+        self.stride = self.idle_stride
+        self.last_sampled = None
+        self.last_emergency = None
+        self.sampled = 0
+
+    def should_sample(self, frame_index):
+        """Return True if `frame_index` falls on the current stride"""
+        if self.last_sampled is None or frame_index - self.last_sampled >= self.stride:
+            self.last_sampled = frame_index
+            self.sampled += 1
+            return True
+        return False
+
+    @property
+    def active(self):
+        """True while an emergency was seen within the last `hold_frames` frames"""
+        return self.last_emergency is not None and self.last_sampled - self.last_emergency <= self.hold_frames
+
+    def update(self, frame_index, emergency_seen):
+        """Feed back whether an inferred frame contained an emergency vehicle"""
+        if emergency_seen:
+            self.last_emergency = frame_index
+            self.stride = self.active_stride
+        elif self.stride < self.idle_stride and (
+            self.last_emergency is None or frame_index - self.last_emergency > self.hold_frames
+        ):
+            self.stride = min(self.idle_stride, self.stride * 2)
+
+    def stats(self):
+        return {
+            "sampled": self.sampled,
+            "stride": self.stride,
+        }
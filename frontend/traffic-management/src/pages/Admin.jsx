@@ -16,16 +16,25 @@ function Admin() {
   const [systemPriority, setSystemPriority] = useState(true);
 
   useEffect(() => {
-    fetchActiveEmergencies();
     fetchJunctions();
-    fetchAllSignals();
-    
-    const interval = setInterval(() => {
-      fetchActiveEmergencies();
-      fetchAllSignals();
-    }, 3000);
 
-    return () => clearInterval(interval);
+    // Server-pushed changes instead of polling; EventSource reconnects
+    // and resumes from the last event ID on its own
+    const events = new EventSource("http://127.0.0.1:5000/events");
+    events.addEventListener("snapshot", (e) => {
+      const data = JSON.parse(e.data);
+      setSignals(data.junctions);
+      setEmergencies(data.emergencies || []);
+    });
+    events.addEventListener("signal", (e) => {
+      const { junction, status } = JSON.parse(e.data);
+      setSignals(prev => ({ ...prev, [junction]: status }));
+    });
+    ["emergency_created", "junction_cleared", "emergency_completed"].forEach(type =>
+      events.addEventListener(type, () => fetchActiveEmergencies())
+    );
+
+    return () => events.close();
   }, []);
 
   const fetchActiveEmergencies = async () => {
@@ -46,6 +46,7 @@ export default function Home() {
   const [file, setFile] = useState(null);
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState(null);
+  const [progress, setProgress] = useState(null);
   
   // Junction states
   const [selectedJunction, setSelectedJunction] = useState("Main Square Junction");
@@ -58,15 +59,23 @@ export default function Home() {
 
   useEffect(() => {
     fetchJunctions();
-    fetchAllJunctionsStatus();
-    fetchActiveEmergencies();
-    
-    const interval = setInterval(() => {
-      fetchAllJunctionsStatus();
-      fetchActiveEmergencies();
-    }, 2000);
 
-    return () => clearInterval(interval);
+    // Server-pushed changes instead of polling; EventSource reconnects
+    // and resumes from the last event ID on its own
+    const events = new EventSource("http://127.0.0.1:5000/events");
+    events.addEventListener("snapshot", (e) => {
+      setJunctionSignals(JSON.parse(e.data).junctions);
+      fetchActiveEmergencies();
+    });
+    events.addEventListener("signal", (e) => {
+      const { junction, status } = JSON.parse(e.data);
+      setJunctionSignals(prev => ({ ...prev, [junction]: status }));
+    });
+    ["emergency_created", "junction_cleared", "emergency_completed"].forEach(type =>
+      events.addEventListener(type, () => fetchActiveEmergencies())
+    );
+
+    return () => events.close();
   }, []);
 
   const fetchJunctions = async () => {
@@ -140,6 +149,7 @@ export default function Home() {
 
     setLoading(true);
     setResult(null);
+    setProgress(null);
 
     const formData = new FormData();
     formData.append("video", file);
@@ -151,8 +161,40 @@ export default function Home() {
         body: formData,
       });
 
-      const data = await res.json();
-      setResult(data);
+      const job = await res.json();
+      if (!res.ok) {
+        alert(job.error || "Analysis could not be queued");
+        setLoading(false);
+        return;
+      }
+
+      // Cached clips come back with the result straight away
+      if (res.status === 200) {
+        setResult(job);
+        fetchAllJunctionsStatus();
+        fetchActiveEmergencies();
+        setLoading(false);
+        return;
+      }
+
+      // Analysis runs in the background, poll the job until it finishes.
+      // "annotating" jobs already have their verdict; the video comes with "done"
+      let status = job;
+      while (["queued", "running", "annotating"].includes(status.status)) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const statusRes = await fetch(`http://127.0.0.1:5000/jobs/${job.job_id}`);
+        status = await statusRes.json();
+        setProgress(status.percent);
+        if (status.status === "annotating") {
+          setResult(status.result);
+        }
+      }
+
+      if (status.status !== "done") {
+        alert(`Analysis ${status.status}${status.error ? `: ${status.error}` : ""}`);
+      } else {
+        setResult(status.result);
+      }
       
       // Refresh after analysis
       fetchAllJunctionsStatus();
@@ -262,7 +304,7 @@ export default function Home() {
                 {loading ? (
                   <>
                     <div className="button-spinner"></div>
-                    PROCESSING {selectedJunction}
+                    PROCESSING {selectedJunction}{progress != null ? ` (${progress}%)` : ""}
                   </>
                 ) : (
                   <>
@@ -0,0 +1,284 @@
+"""
+Pluggable CPU inference backends for the YOLO detectors.
+
+The torch backend runs the `.pt` weights directly. The onnx and openvino
+backends export the weights once (next to the `.pt` file) and load the
+exported model through ultralytics again, so letterboxing, NMS and class
+names stay exactly the same. The backend is picked per model in
+config.json `models.<key>.backend`. The `*-int8` backends load models
+produced (and accuracy-checked) by quantize_model.py.
+
+Parity and latency check against the torch backend:
+
+    python inference_backends.py runs/detect/train2/weights/best.pt --backends onnx openvino
+
+test_inference_backends.py runs the ONNX part of that check under pytest.
+"""
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+# ================= CONFIG =================
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+DEFAULT_BACKEND = "torch"
+EXPORT_IMGSZ = 640
+PARITY_IOU = 0.9          # boxes must overlap this much to count as "the same"
+PARITY_MIN_MATCH = 0.95   # fraction of torch boxes the backend has to reproduce
+# =========================================
+
+
+class TorchBackend:
+    """Ultralytics YOLO on the original PyTorch weights"""
+
+    name = "torch"
+    batched = True  # accepts a list of images in one call
+
+    def __init__(self, weights):
+        from ultralytics import YOLO
+
+        self.weights = str(weights)
+        self.model = YOLO(self._model_path(), task="detect")
+        self.names = self.model.names
+
+    def _model_path(self):
+        return self.weights
+
+    def __call__(self, images, **kwargs):
+        # Static-shape exports take one image per call
+        if isinstance(images, list) and not self.batched:
+            return [self.model(image, **kwargs)[0] for image in images]
+        return self.model(images, **kwargs)
+
+
+class OnnxBackend(TorchBackend):
+    """ONNX Runtime on a dynamic-batch ONNX export"""
+
+    name = "onnx"
+    export_format = "onnx"
+    export_args = {"dynamic": True}
+
+    def _export_path(self):
+        return Path(self.weights).with_suffix(".onnx")
+
+    def _is_stale(self, exported):
+        return not exported.exists() or exported.stat().st_mtime < os.path.getmtime(self.weights)
+
+    def _model_path(self):
+        """
+        Export the weights if needed and return the exported model.
+
+        Analysis worker processes and stream threads load detectors
+        concurrently, so the check and export hold an flock next to the
+        weights. The export runs on a copy of the weights in a temp
+        directory and is moved into place with os.replace, so a loader
+        never opens a half-written model.
+        """
+        exported = self._export_path()
+        if not self._is_stale(exported):
+            return str(exported)
+
+        with open(f"{self.weights}.export.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if self._is_stale(exported):
+                    self._export(exported)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        return str(exported)
+
+    def _export(self, exported):
+        from ultralytics import YOLO
+
+        print(f"🔄 Exporting {self.weights} to {self.export_format}...")
+        tmp_dir = tempfile.mkdtemp(dir=exported.parent, prefix=".export-")
+        try:
+            tmp_weights = os.path.join(tmp_dir, os.path.basename(self.weights))
+            shutil.copy2(self.weights, tmp_weights)
+            tmp_exported = YOLO(tmp_weights).export(
+                format=self.export_format, imgsz=EXPORT_IMGSZ, **self.export_args
+            )
+            if exported.is_dir():
+                # os.replace cannot overwrite a non-empty directory; move the stale one aside
+                stale = tempfile.mkdtemp(dir=tmp_dir, prefix="stale-")
+                os.replace(exported, os.path.join(stale, exported.name))
+            os.replace(tmp_exported, exported)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+class OpenVINOBackend(OnnxBackend):
+    """OpenVINO on a static-shape IR export"""
+
+    name = "openvino"
+    export_format = "openvino"
+    export_args = {}
+    batched = False
+
+    def _export_path(self):
+        weights = Path(self.weights)
+        return weights.parent / f"{weights.stem}_openvino_model"
+
+
+class OnnxInt8Backend(OnnxBackend):
+    """ONNX Runtime on the INT8 model accepted by quantize_model.py"""
+
+    name = "onnx-int8"
+
+    def _export_path(self):
+        weights = Path(self.weights)
+        return weights.parent / f"{weights.stem}_int8.onnx"
+
+    def _model_path(self):
+        # Quantization needs calibration and an accuracy gate, so it is never done on load
+        exported = self._export_path()
+        if not exported.exists():
+            raise FileNotFoundError(f"{exported} not found, run quantize_model.py {self.weights} first")
+        return str(exported)
+
+
+class OpenVINOInt8Backend(OnnxInt8Backend):
+    """OpenVINO on the INT8 IR accepted by quantize_model.py"""
+
+    name = "openvino-int8"
+    batched = False
+
+    def _export_path(self):
+        weights = Path(self.weights)
+        return weights.parent / f"{weights.stem}_int8_openvino_model"
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+    OpenVINOBackend.name: OpenVINOBackend,
+    OnnxInt8Backend.name: OnnxInt8Backend,
+    OpenVINOInt8Backend.name: OpenVINOInt8Backend,
+}
+
+
+def configured_backend(model_key="emergency_detector", config_path=CONFIG_PATH):
+    """Backend name configured for a config.json `models` entry"""
+    try:
+        with open(config_path) as f:
+            models = json.load(f).get("models", {})
+    except (OSError, json.JSONDecodeError):
+        return DEFAULT_BACKEND
+    return models.get(model_key, {}).get("backend", DEFAULT_BACKEND)
+
+
+def load_detector(weights, backend=None, model_key="emergency_detector"):
+    """Load `weights` with the given backend (or the one configured for `model_key`)"""
+    backend = backend or configured_backend(model_key)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {list(BACKENDS)}")
+    detector = BACKENDS[backend](weights)
+    print(f"✅ {weights} loaded with {backend} backend")
+    return detector
+
+
+def _box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _boxes(result):
+    return list(zip(
+        result.boxes.xyxy.cpu().numpy().tolist(),
+        result.boxes.cls.cpu().numpy().astype(int).tolist(),
+        result.boxes.conf.cpu().numpy().tolist(),
+    ))
+
+
+def compare_backends(weights, images, backends, conf=0.5, warmup=3):
+    """
+    Run every image through torch and each backend; report box parity
+    against torch and per-image latency percentiles for all of them.
+    """
+    import cv2
+    import numpy as np
+
+    frames = [cv2.imread(str(path)) for path in images]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        raise ValueError("No readable images to compare on")
+
+    report = {"images": len(frames), "backends": {}}
+    reference = None
+
+    for name in [TorchBackend.name] + [b for b in backends if b != TorchBackend.name]:
+        detector = load_detector(weights, backend=name)
+        for frame in frames[:warmup]:
+            detector(frame, conf=conf, verbose=False)
+
+        latencies = []
+        outputs = []
+        for frame in frames:
+            start = time.perf_counter()
+            result = detector(frame, conf=conf, verbose=False)[0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            outputs.append(_boxes(result))
+
+        entry = {
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+            "mean_ms": round(float(np.mean(latencies)), 2),
+            "boxes": sum(len(o) for o in outputs),
+        }
+
+        if reference is None:
+            reference = outputs
+        else:
+            matched = 0
+            total = 0
+            max_conf_diff = 0.0
+            for ref_boxes, boxes in zip(reference, outputs):
+                for ref_box, ref_cls, ref_conf in ref_boxes:
+                    total += 1
+                    best = max(
+                        ((_box_iou(ref_box, box), c) for box, cls, c in boxes if cls == ref_cls),
+                        default=(0.0, 0.0),
+                    )
+                    if best[0] >= PARITY_IOU:
+                        matched += 1
+                        max_conf_diff = max(max_conf_diff, abs(best[1] - ref_conf))
+            entry["parity_match"] = round(matched / total, 3) if total else 1.0
+            entry["max_conf_diff"] = round(max_conf_diff, 3)
+            entry["parity_ok"] = entry["parity_match"] >= PARITY_MIN_MATCH
+            entry["speedup_vs_torch"] = round(report["backends"]["torch"]["mean_ms"] / entry["mean_ms"], 2)
+
+        report["backends"][name] = entry
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check backend parity and latency against torch")
+    parser.add_argument("weights", help=".pt weights to export and compare")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "openvino"], choices=list(BACKENDS))
+    parser.add_argument("--images", default="project/datasets/emergency_vehicles/valid/images")
+    parser.add_argument("--limit", type=int, default=100, help="number of images to use")
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    images = sorted(Path(args.images).glob("*.jpg"))[:args.limit]
+    report = compare_backends(args.weights, images, args.backends, conf=args.conf)
+    print(json.dumps(report, indent=2))
+
+    failed = [name for name, entry in report["backends"].items() if entry.get("parity_ok") is False]
+    if failed:
+        print(f"❌ Parity check failed for: {', '.join(failed)}")
+        raise SystemExit(1)
+    print("✅ All backends match torch")
+
+
+if __name__ == "__main__":
+    main()
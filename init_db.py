@@ -1,5 +1,8 @@
 from database import db
 
+# The database is initialized lazily; force schema creation and seeding now
+db.get()
+
 print("✅ Database initialized successfully!")
 print("📊 Tables created:")
 print("   - ambulances")
@@ -5,17 +5,24 @@ Advanced AI-powered emergency vehicle detection with real-time alerts
 """
 
 import cv2
-from ultralytics import YOLO
 import numpy as np
 from datetime import datetime
+from collections import deque
 import time
 
 # --- CONFIGURATION ---
 import os
+import sys
 from pathlib import Path
 
 # Get the project root directory (3 levels up from this file)
 PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+# Shared modules (inference backends) live in the repository root
+sys.path.insert(0, str(PROJECT_ROOT.parent))
+from inference_backends import load_detector
+from detection_zones import merge_tile_detections
+from detections import FrameDetections
 MODEL_PATH_EMERGENCY = str(PROJECT_ROOT / "models" / "yolo_emergency_detector.pt")
 MODEL_PATH_GENERAL = 'yolov8m.pt'  # This will be downloaded automatically
 VIDEO_PATH = str(PROJECT_ROOT / "videos" / "emergency2.mp4")
@@ -25,6 +32,15 @@ EMERGENCY_CLASSES = ['ambulance', 'fire brigade', 'police']
 NORMAL_CAR_CLASS = 'car'
 CONFIDENCE_THRESHOLD = 0.5
 
+# --- DETECTION MODE ---
+# 'cascade':  general model proposes vehicles, emergency model runs on their crops (one batched call)
+# 'gate':     emergency model runs on the full frame only when the general model found vehicles
+# 'parallel': both models on every full frame (original behaviour)
+DETECTION_MODE = os.environ.get('DETECTION_MODE', 'cascade')
+PROPOSAL_CLASSES = ['car', 'bus', 'truck']  # general-model classes an emergency vehicle can show up as
+CROP_PADDING = 0.15  # context added around each proposal, as a fraction of its size
+STAGE_WINDOW = 100   # recent frames kept per stage for the status line and p95
+
 # Visual styling
 COLORS = {
     'emergency': (0, 0, 255),      # Red for emergency vehicles
@@ -66,51 +82,99 @@ class EmergencyAlert:
     def get_total_count(self):
         return len(self.alert_history)
 
-def create_enhanced_overlay(frame, emergency_count, normal_count, alerts, fps=0):
-    """Create professional overlay with emergency alerts and statistics"""
-    h, w = frame.shape[:2]
-    overlay = frame.copy()
-    
-    # Header bar
-    cv2.rectangle(overlay, (0, 0), (w, 140), COLORS['text_bg'], -1)
-    cv2.addWeighted(overlay, 0.8, frame, 0.2, 0, frame)
-    
-    # Title with emergency indicator
-    title_color = COLORS['alert'] if alerts.get_active_count() > 0 else COLORS['header']
-    cv2.putText(frame, "EMERGENCY VEHICLE DETECTION SYSTEM", (20, 35), 
-                cv2.FONT_HERSHEY_DUPLEX, 1.0, title_color, 2)
-    
-    # Timestamp
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cv2.putText(frame, f"TIME: {timestamp}", (w-300, 35), 
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    
-    # Statistics
-    cv2.putText(frame, f"Emergency Vehicles: {emergency_count}", (20, 70), 
-                cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['emergency'], 2)
-    cv2.putText(frame, f"Normal Vehicles: {normal_count}", (20, 100), 
-                cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['normal'], 2)
-    
-    # Alert status
-    active_alerts = alerts.get_active_count()
-    total_alerts = alerts.get_total_count()
-    alert_text = f"Active Alerts: {active_alerts} | Total: {total_alerts}"
-    cv2.putText(frame, alert_text, (w-400, 70), 
-                cv2.FONT_HERSHEY_SIMPLEX, 0.7, COLORS['alert'], 2)
-    
-    # FPS counter
-    if fps > 0:
-        cv2.putText(frame, f"FPS: {fps:.1f}", (w-150, 100), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-    
-    # Emergency alert banner
-    if active_alerts > 0:
-        alert_y = 150
-        cv2.rectangle(frame, (0, alert_y), (w, alert_y + 50), COLORS['alert'], -1)
-        cv2.putText(frame, "EMERGENCY VEHICLE DETECTED - PRIORITY CLEARANCE REQUIRED", 
-                    (50, alert_y + 30), cv2.FONT_HERSHEY_DUPLEX, 1.0, (0, 0, 0), 2)
-    
-    return frame
+HEADER_HEIGHT = 141  # rows 0..140 of the header bar
+BANNER_TOP = 150
+BANNER_HEIGHT = 51   # rows 150..200 of the alert banner
+TITLE_TEXT = "EMERGENCY VEHICLE DETECTION SYSTEM"
+BANNER_TEXT = "EMERGENCY VEHICLE DETECTED - PRIORITY CLEARANCE REQUIRED"
+
+class OverlayRenderer:
+    """
+    Professional overlay with emergency alerts and statistics, drawn in place.
+
+    Only the header ROI is darkened (one in-place scale instead of a
+    full-frame copy + addWeighted). The title and the alert banner are
+    rasterized once per frame size and pasted from the cache; only the
+    timestamp, counters, FPS and stage times are drawn per frame.
+    """
+
+    def __init__(self):
+        self.size = None
+        self.titles = {}
+        self.banner = None
+
+    def _prepare(self, h, w):
+        """Rasterize the static layers for a new frame size"""
+        self.size = (h, w)
+
+        # Title ink coverage (glyph edges may be anti-aliased), pasted in either colour
+        coverage = np.zeros((min(h, HEADER_HEIGHT), w), np.uint8)
+        cv2.putText(coverage, TITLE_TEXT, (20, 35), cv2.FONT_HERSHEY_DUPLEX, 1.0, 255, 2)
+        ys, xs = np.nonzero(coverage)
+        self.titles = {}
+        if len(ys):
+            y1, y2, x1, x2 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+            alpha = coverage[y1:y2, x1:x2, None].astype(np.float32) / 255
+            self.titles['roi'] = (slice(y1, y2), slice(x1, x2))
+            self.titles['keep'] = 1 - alpha
+            for color in (COLORS['alert'], COLORS['header']):
+                self.titles[color] = alpha * np.array(color, np.float32) + 0.5
+
+        banner = np.empty((BANNER_HEIGHT, w, 3), np.uint8)
+        banner[:] = COLORS['alert']
+        cv2.putText(banner, BANNER_TEXT, (50, 30), cv2.FONT_HERSHEY_DUPLEX, 1.0, (0, 0, 0), 2)
+        self.banner = banner
+
+    def draw(self, frame, emergency_count, normal_count, alerts, fps=0, stage_ms=None):
+        h, w = frame.shape[:2]
+        if self.size != (h, w):
+            self._prepare(h, w)
+
+        # Header bar: 80% black over the top rows, blended in place
+        header = frame[:HEADER_HEIGHT]
+        cv2.convertScaleAbs(header, dst=header, alpha=0.2)
+
+        # Title with emergency indicator (cached)
+        active_alerts = alerts.get_active_count()
+        if self.titles:
+            title_color = COLORS['alert'] if active_alerts > 0 else COLORS['header']
+            roi = frame[self.titles['roi']]
+            roi[:] = roi * self.titles['keep'] + self.titles[title_color]
+
+        # Timestamp
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        cv2.putText(frame, f"TIME: {timestamp}", (w-300, 35), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+        # Statistics
+        cv2.putText(frame, f"Emergency Vehicles: {emergency_count}", (20, 70), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['emergency'], 2)
+        cv2.putText(frame, f"Normal Vehicles: {normal_count}", (20, 100), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, COLORS['normal'], 2)
+
+        # Alert status
+        total_alerts = alerts.get_total_count()
+        alert_text = f"Active Alerts: {active_alerts} | Total: {total_alerts}"
+        cv2.putText(frame, alert_text, (w-400, 70), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, COLORS['alert'], 2)
+
+        # FPS counter
+        if fps > 0:
+            cv2.putText(frame, f"FPS: {fps:.1f}", (w-150, 100), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+        # Per-stage inference time of this frame
+        if stage_ms:
+            cv2.putText(frame, f"{DETECTION_MODE.upper()} | General: {stage_ms['general']:.1f} ms | "
+                        f"Emergency: {stage_ms['emergency']:.1f} ms", (20, 130),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+        # Emergency alert banner (cached)
+        if active_alerts > 0:
+            rows = max(0, min(h - BANNER_TOP, BANNER_HEIGHT))
+            frame[BANNER_TOP:BANNER_TOP + rows] = self.banner[:rows]
+
+        return frame
 
 def draw_enhanced_detection(frame, box, class_name, confidence, is_emergency=False):
     """Draw enhanced bounding boxes with professional styling"""
@@ -169,6 +233,83 @@ def draw_enhanced_detection(frame, box, class_name, confidence, is_emergency=Fal
         pulse_color = (pulse_intensity, pulse_intensity, 255)
         cv2.rectangle(frame, (x1-2, y1-2), (x2+2, y2+2), pulse_color, 1)
 
+def detect_general(general_model, frame):
+    """General model: FrameDetections above the confidence threshold"""
+    results = general_model(frame, verbose=False)[0]
+    return FrameDetections.from_results(results, min_conf=CONFIDENCE_THRESHOLD)
+
+def _emergency_boxes(results, offset=(0, 0)):
+    detections = FrameDetections.from_results(results, offset, min_conf=CONFIDENCE_THRESHOLD)
+    return detections.filter(detections.class_mask(EMERGENCY_CLASSES))
+
+def detect_emergency(emergency_model, frame, proposals=None):
+    """
+    Emergency model: FrameDetections of emergency classes above the threshold.
+
+    With `proposals` (general-model vehicle boxes) only padded crops of
+    those boxes are classified, in one batched call, and overlapping
+    crop results are merged back into single full-frame boxes.
+    """
+    if proposals is None:
+        return _emergency_boxes(emergency_model(frame, verbose=False)[0])
+
+    h, w = frame.shape[:2]
+    pad = ((proposals.xyxy[:, 2:] - proposals.xyxy[:, :2]) * CROP_PADDING).astype(np.int32)
+    crop_boxes = np.concatenate([proposals.xyxy[:, :2] - pad, proposals.xyxy[:, 2:] + pad], axis=1)
+    crop_boxes = np.clip(crop_boxes, 0, [w, h, w, h])
+
+    crops, offsets = [], []
+    for cx1, cy1, cx2, cy2 in crop_boxes.tolist():
+        if cx2 > cx1 and cy2 > cy1:
+            crops.append(frame[cy1:cy2, cx1:cx2])
+            offsets.append((cx1, cy1))
+    if not crops:
+        return FrameDetections.empty(emergency_model.names)
+
+    records = [_emergency_boxes(results, offset)
+               for results, offset in zip(emergency_model(crops, verbose=False), offsets)]
+    detections = FrameDetections.concat(records)
+    if len(detections) > 1:
+        detections = FrameDetections.from_rows(merge_tile_detections(detections.rows()), detections.names)
+    return detections
+
+class StageTimes:
+    """
+    Per-frame milliseconds of each detection stage, in constant memory.
+
+    The video loops forever, so only the last STAGE_WINDOW frames are kept
+    (status line, p95); session means come from running sums. `last`
+    holds this frame's times and is updated in place for the overlay.
+    """
+
+    def __init__(self, stages, window=STAGE_WINDOW):
+        self.last = {stage: 0.0 for stage in stages}
+        self.recent = {stage: deque(maxlen=window) for stage in stages}
+        self.total_ms = {stage: 0.0 for stage in stages}
+        self.ran = {stage: 0 for stage in stages}
+        self.frames = 0
+
+    def add(self, stage_ms):
+        self.frames += 1
+        for stage, ms in stage_ms.items():
+            self.last[stage] = ms
+            self.recent[stage].append(ms)
+            self.total_ms[stage] += ms
+            if ms > 0:
+                self.ran[stage] += 1
+
+    def recent_mean(self, stage):
+        return np.mean(self.recent[stage]) if self.recent[stage] else 0.0
+
+def report_stage_times(stage_times):
+    """Mean per-frame milliseconds of each detection stage, p95 over the last STAGE_WINDOW frames"""
+    if not stage_times.frames:
+        return
+    for stage, recent in stage_times.recent.items():
+        print(f"{stage.capitalize():<10} mean {stage_times.total_ms[stage] / stage_times.frames:7.1f} ms | "
+              f"p95 {np.percentile(recent, 95):7.1f} ms (last {len(recent)}) | "
+              f"ran on {stage_times.ran[stage]}/{stage_times.frames} frames")
+
 def print_banner():
     """Print startup banner"""
     print("\n" + "="*70)
@@ -188,14 +329,14 @@ def main():
     
     print("Loading AI models...")
     try:
-        emergency_model = YOLO(MODEL_PATH_EMERGENCY)
+        emergency_model = load_detector(MODEL_PATH_EMERGENCY, model_key="emergency_detector")
         print("Emergency detection model loaded")
     except Exception as e:
         print(f"Error loading emergency model: {e}")
         return
 
     try:
-        general_model = YOLO(MODEL_PATH_GENERAL)
+        general_model = load_detector(MODEL_PATH_GENERAL, model_key="general_detector")
         print("General vehicle model loaded")
     except Exception as e:
         print(f"Error loading general model: {e}")
@@ -217,7 +358,7 @@ def main():
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     cv2.resizeWindow(window_name, min(1200, frame_width), min(800, frame_height))
 
-    print("Starting detection system...")
+    print(f"Starting detection system ({DETECTION_MODE} mode)...")
     print("Controls: 'q' = quit, 's' = save screenshot, 'r' = reset alerts")
     print("="*70)
 
@@ -225,10 +366,13 @@ def main():
     start_time = time.time()
     fps_counter = 0
     last_fps_time = start_time
+    stage_times = StageTimes(['general', 'emergency'])
+    overlay = OverlayRenderer()
+    frame = None  # decode buffer, reused by cap.read() every frame
 
     # --- Main Processing Loop ---
     while True:
-        ret, frame = cap.read()
+        ret, frame = cap.read(frame)
         if not ret:
             print("\nEnd of video reached. Restarting...")
             cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop video
@@ -247,41 +391,45 @@ def main():
             current_fps = 0
 
         # --- AI Detection ---
-        general_results = general_model(frame, verbose=False)[0]
-        emergency_results = emergency_model(frame, verbose=False)[0]
+        stage_start = time.perf_counter()
+        general_detections = detect_general(general_model, frame)
+        general_ms = (time.perf_counter() - stage_start) * 1000
 
-        emergency_count = 0
-        normal_count = 0
+        # Cascade: the emergency model only looks at what the general model proposed
+        stage_start = time.perf_counter()
+        proposals = general_detections.filter(general_detections.class_mask(PROPOSAL_CLASSES))
+        emergency_detections = FrameDetections.empty(emergency_model.names)
+        if DETECTION_MODE == 'parallel' or (DETECTION_MODE == 'gate' and len(proposals)):
+            emergency_detections = detect_emergency(emergency_model, frame)
+        elif len(proposals):
+            emergency_detections = detect_emergency(emergency_model, frame, proposals)
+        # 0 ms marks a frame where the emergency model was skipped (no vehicles)
+        ran_emergency = DETECTION_MODE == 'parallel' or len(proposals) > 0
+        emergency_ms = (time.perf_counter() - stage_start) * 1000 if ran_emergency else 0.0
 
-        # Process normal vehicles
-        for box in general_results.boxes:
-            confidence = float(box.conf[0])
-            if confidence > CONFIDENCE_THRESHOLD:
-                class_id = int(box.cls[0])
-                class_name = general_results.names[class_id]
+        stage_times.add({'general': general_ms, 'emergency': emergency_ms})
 
-                if class_name == NORMAL_CAR_CLASS:
-                    bbox = box.xyxy[0].cpu().numpy().astype(int)
-                    draw_enhanced_detection(frame, bbox, class_name, confidence, False)
-                    normal_count += 1
+        cars = general_detections.filter(general_detections.class_mask([NORMAL_CAR_CLASS]))
+        normal_count = len(cars)
+        emergency_count = len(emergency_detections)
+
+        # Process normal vehicles
+        for x1, y1, x2, y2, confidence, class_name in cars.rows():
+            draw_enhanced_detection(frame, (x1, y1, x2, y2), class_name, confidence, False)
 
         # Process emergency vehicles
-        for box in emergency_results.boxes:
-            confidence = float(box.conf[0])
-            if confidence > CONFIDENCE_THRESHOLD:
-                class_id = int(box.cls[0])
-                class_name = emergency_results.names[class_id]
-
-                if class_name in EMERGENCY_CLASSES:
-                    bbox = box.xyxy[0].cpu().numpy().astype(int)
-                    draw_enhanced_detection(frame, bbox, class_name, confidence, True)
-                    emergency_count += 1
-                    
-                    # Add to alert system
-                    alerts.add_alert(class_name, confidence, bbox)
+        for x1, y1, x2, y2, confidence, class_name in emergency_detections.rows():
+            draw_enhanced_detection(frame, (x1, y1, x2, y2), class_name, confidence, True)
+
+        # One alert per frame, for the most confident emergency vehicle
+        best, confidence = emergency_detections.best()
+        if best is not None:
+            class_name = emergency_detections.names[int(emergency_detections.cls[best])]
+            alerts.add_alert(class_name, confidence, emergency_detections.xyxy[best])
 
         # Apply enhanced overlay
-        frame = create_enhanced_overlay(frame, emergency_count, normal_count, alerts, current_fps)
+        frame = overlay.draw(frame, emergency_count, normal_count, alerts, current_fps,
+                             stage_times.last)
 
         # Display frame
         cv2.imshow(window_name, frame)
@@ -305,7 +453,9 @@ def main():
         if frame_count % 100 == 0:
             runtime = current_time - start_time
             print(f"Frame {frame_count:6d} | Runtime: {runtime:6.1f}s | "
-                  f"Emergency: {alerts.get_total_count():3d} | Normal: {normal_count:3d}")
+                  f"Emergency: {alerts.get_total_count():3d} | Normal: {normal_count:3d} | "
+                  f"General: {stage_times.recent_mean('general'):.1f} ms | "
+                  f"Emergency model: {stage_times.recent_mean('emergency'):.1f} ms")
 
     # --- Final Report ---
     runtime = time.time() - start_time
@@ -316,6 +466,8 @@ def main():
     print(f"Frames Processed: {frame_count:,}")
     print(f"Emergency Vehicles Detected: {alerts.get_total_count()}")
     print(f"Average FPS: {frame_count/runtime:.1f}")
+    print(f"Detection mode: {DETECTION_MODE}")
+    report_stage_times(stage_times)
     print("="*70)
 
     # Cleanup
@@ -0,0 +1,231 @@
+"""
+INT8 static quantization of the emergency detector.
+
+Calibrates on the validation images, then evaluates the INT8 model's
+mAP50 on the validation labels against the original torch weights. The
+model is kept only if mAP50 drops by at most --max-map50-drop; otherwise
+it is renamed to `*.rejected` so the `*-int8` backends will not load it.
+The accuracy/latency report (written next to the weights) is produced
+either way, so the trade-off can be judged per site.
+
+    python quantize_model.py runs/detect/train2/weights/best.pt --format onnx
+    python quantize_model.py runs/detect/train2/weights/best.pt --format openvino
+
+Once accepted, enable it per model in config.json, e.g.
+`"backend": "onnx-int8"`.
+"""
+
+import os
+import json
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from inference_backends import (
+    EXPORT_IMGSZ, OnnxBackend, OnnxInt8Backend, OpenVINOInt8Backend, compare_backends
+)
+
+# ================= CONFIG =================
+DATASET_DIR = "project/datasets/emergency_vehicles"
+CALIBRATION_IMAGES = os.path.join(DATASET_DIR, "valid", "images")
+CALIBRATION_LIMIT = 300     # images fed to the calibrator
+MAX_MAP50_DROP = 0.01       # largest acceptable mAP50 loss vs the torch model
+LATENCY_IMAGES = 100        # images used for the latency comparison
+# =========================================
+
+
+def _letterbox(image, size=EXPORT_IMGSZ):
+    """Same preprocessing as ultralytics for exported models: letterbox, RGB, CHW, 0..1"""
+    import cv2
+    import numpy as np
+
+    h, w = image.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top = (size - new_h) // 2
+    left = (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+
+    tensor = canvas[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(tensor, dtype=np.float32)[None] / 255.0
+
+
+class ImageCalibrationReader:
+    """onnxruntime calibration data reader over a folder of images"""
+
+    def __init__(self, images, input_name):
+        self.images = list(images)
+        self.input_name = input_name
+        self.position = 0
+
+    def get_next(self):
+        import cv2
+
+        while self.position < len(self.images):
+            image = cv2.imread(str(self.images[self.position]))
+            self.position += 1
+            if image is not None:
+                return {self.input_name: _letterbox(image)}
+        return None
+
+    def rewind(self):
+        self.position = 0
+
+    def __iter__(self):
+        self.rewind()
+        return iter(self.get_next, None)
+
+
+def _calibration_images(limit=CALIBRATION_LIMIT):
+    images = sorted(Path(CALIBRATION_IMAGES).glob("*.jpg"))[:limit]
+    if not images:
+        raise FileNotFoundError(f"No calibration images in {CALIBRATION_IMAGES}")
+    return images
+
+
+def _dataset_yaml():
+    """data.yaml with absolute paths (the Roboflow one uses paths relative to train/)"""
+    with open(os.path.join(DATASET_DIR, "data.yaml")) as f:
+        lines = f.read().splitlines()
+    names = next(line for line in lines if line.startswith("names:"))
+    nc = next(line for line in lines if line.startswith("nc:"))
+
+    handle, path = tempfile.mkstemp(suffix=".yaml")
+    with os.fdopen(handle, "w") as f:
+        f.write(f"path: {os.path.abspath(DATASET_DIR)}\n")
+        f.write("train: train/images\nval: valid/images\n")
+        f.write(f"{nc}\n{names}\n")
+    return path
+
+
+def _head_nodes(onnx_path):
+    """Nodes of the final Detect layer; box decoding loses too much precision in INT8"""
+    import onnx
+
+    graph = onnx.load(onnx_path).graph
+    layers = [node.name.split("/")[1] for node in graph.node if node.name.startswith("/model.")]
+    if not layers:
+        return []
+    head = max(layers, key=lambda name: int(name.split(".")[1]))
+    return [node.name for node in graph.node if node.name.startswith(f"/{head}/")]
+
+
+def quantize_onnx(weights, images):
+    """Static QDQ quantization of the ONNX export; returns the INT8 model path"""
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    fp32_path = OnnxBackend(weights)._model_path()
+    int8_path = str(Path(weights).parent / f"{Path(weights).stem}_int8.onnx")  # OnnxInt8Backend path
+
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    print(f"🔄 Calibrating on {len(images)} images from {CALIBRATION_IMAGES}...")
+    quantize_static(
+        fp32_path,
+        int8_path,
+        ImageCalibrationReader(images, input_name),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.Percentile,
+        nodes_to_exclude=_head_nodes(fp32_path),
+    )
+    return int8_path
+
+
+def quantize_openvino(weights, data_yaml):
+    """NNCF post-training quantization through the ultralytics exporter"""
+    from ultralytics import YOLO
+
+    print(f"🔄 Calibrating on the validation split of {DATASET_DIR}...")
+    exported = YOLO(weights).export(format="openvino", int8=True, data=data_yaml, imgsz=EXPORT_IMGSZ)
+    return str(exported).rstrip(os.sep)
+
+
+def evaluate_map50(model_path, data_yaml):
+    """mAP50 of a model on the validation split"""
+    from ultralytics import YOLO
+
+    metrics = YOLO(model_path, task="detect").val(
+        data=data_yaml, split="val", imgsz=EXPORT_IMGSZ, batch=1, plots=False, verbose=False
+    )
+    return round(float(metrics.box.map50), 4)
+
+
+def quantize(weights, fmt="onnx", max_map50_drop=MAX_MAP50_DROP, calibration_limit=CALIBRATION_LIMIT):
+    """Quantize, gate on mAP50 and measure latency; returns the report dict"""
+    backend = OnnxInt8Backend if fmt == "onnx" else OpenVINOInt8Backend
+    fp32_backend = "onnx" if fmt == "onnx" else "openvino"
+    data_yaml = _dataset_yaml()
+
+    try:
+        if fmt == "onnx":
+            int8_path = quantize_onnx(weights, _calibration_images(calibration_limit))
+        else:
+            int8_path = quantize_openvino(weights, data_yaml)
+
+        print("📏 Evaluating mAP50...")
+        baseline_map50 = evaluate_map50(weights, data_yaml)
+        int8_map50 = evaluate_map50(int8_path, data_yaml)
+    finally:
+        os.remove(data_yaml)
+
+    drop = round(baseline_map50 - int8_map50, 4)
+    accepted = drop <= max_map50_drop
+
+    report = {
+        "weights": str(weights),
+        "format": fmt,
+        "backend": backend.name,
+        "int8_model": int8_path,
+        "map50_torch": baseline_map50,
+        "map50_int8": int8_map50,
+        "map50_drop": drop,
+        "max_map50_drop": max_map50_drop,
+        "accepted": accepted,
+    }
+
+    # Measured before the gate so a rejected model still shows what it would have gained
+    latency_images = sorted(Path(CALIBRATION_IMAGES).glob("*.jpg"))[:LATENCY_IMAGES]
+    report["latency"] = compare_backends(weights, latency_images, [fp32_backend, backend.name])["backends"]
+
+    if accepted:
+        print(f"✅ INT8 model accepted (mAP50 {baseline_map50} -> {int8_map50})")
+    else:
+        rejected = f"{int8_path}.rejected"
+        if os.path.isdir(rejected):
+            shutil.rmtree(rejected)
+        elif os.path.exists(rejected):
+            os.remove(rejected)
+        os.replace(int8_path, rejected)
+        report["int8_model"] = rejected
+        print(f"❌ INT8 model rejected: mAP50 dropped by {drop} (max {max_map50_drop})")
+
+    report_path = Path(weights).parent / f"{Path(weights).stem}_{backend.name}_report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {report_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 static quantization with an mAP50 acceptance gate")
+    parser.add_argument("weights", help=".pt weights to quantize")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--max-map50-drop", type=float, default=MAX_MAP50_DROP)
+    parser.add_argument("--calibration-limit", type=int, default=CALIBRATION_LIMIT)
+    args = parser.parse_args()
+
+    report = quantize(args.weights, args.format, args.max_map50_drop, args.calibration_limit)
+    print(json.dumps(report, indent=2))
+    if not report["accepted"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
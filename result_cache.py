@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# ================= CONFIG =================
+OUTPUT_DIR = "output"
+CACHE_INDEX = os.path.join(OUTPUT_DIR, ".result_cache.json")
+CACHE_LOCK = os.path.join(OUTPUT_DIR, ".result_cache.lock")
+CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 2 * 1024 ** 3))  # whole OUTPUT_DIR
+WRITE_GRACE_SECONDS = 300  # files modified this recently may still be written, never evicted
+CACHE_VERSION = 1  # bump when analysis output changes for the same model
+# =========================================
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """Content hash of an uploaded file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(video_path, camera=None, tiled=False):
+    """Cache key: video content + model weights/backend + threshold + zone cropping + tiling"""
+    from emergency_core import MODEL_PATH, CONF_THRESHOLD
+    from inference_backends import configured_backend
+
+    try:
+        stat = os.stat(MODEL_PATH)
+        model_version = f"{MODEL_PATH}:{stat.st_size}:{int(stat.st_mtime)}"
+    except OSError:
+        model_version = MODEL_PATH
+    model_version += f":{configured_backend()}"
+    parts = [file_sha256(video_path), model_version, str(CONF_THRESHOLD), camera or "", str(CACHE_VERSION)]
+    if tiled:
+        parts.append("tiled")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def overlay_state(result):
+    """What an annotated video has burned in: its junction and the scheduled/random banner"""
+    return {
+        "junction": result.get("junction"),
+        "emergency": result.get("emergency"),
+        "is_scheduled": result.get("is_scheduled"),
+        "ambulance_number": result.get("ambulance_number"),
+        "lane_to_clear": result.get("lane_to_clear"),
+    }
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache of analysis results and their annotated videos.
+
+    Entries store the junction-independent part of a result (output video,
+    vehicle events, timings); callers rebuild the junction-specific result
+    with emergency_core.replay_vehicle_events on a hit. The stored video
+    shows the original run's junction and banner, so each entry also keeps
+    its overlay_state; a replay whose state differs must not serve it.
+
+    The bound covers all of OUTPUT_DIR, not just cached videos: when it
+    exceeds `max_bytes`, files are deleted least recently used first
+    (cached videos by last hit, other outputs by modification time),
+    skipping anything modified in the last WRITE_GRACE_SECONDS.
+
+    Web and worker processes share the index, so every load-modify-save
+    holds an flock on `lock_path` and writes through a unique temp file.
+    """
+
+    def __init__(self, index_path=CACHE_INDEX, max_bytes=CACHE_MAX_BYTES, lock_path=CACHE_LOCK):
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.lock_path = lock_path
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+            with open(self.lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, index):
+        handle, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.index_path) or ".", prefix=".result_cache.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(handle, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def get(self, key):
+        """Cached entry for `key`, or None (also if its video was removed)"""
+        with self._locked():
+            index = self._load()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(os.path.join(OUTPUT_DIR, entry["output_filename"])):
+                del index[key]
+                self._save(index)
+                return None
+            entry["last_used"] = time.time()
+            self._save(index)
+            return entry
+
+    def put(self, key, result):
+        """Store a finished analyze_video result and evict down to max_bytes"""
+        if not result.get("output_video") or result.get("annotation_pending"):
+            self.trim()
+            return  # detect-only or early-exit result, no complete video to replay
+        output_filename = os.path.basename(result["output_video"])
+        video_path = os.path.join(OUTPUT_DIR, output_filename)
+        if not os.path.exists(video_path):
+            self.trim()
+            return
+
+        with self._locked():
+            index = self._load()
+            index[key] = {
+                "output_filename": output_filename,
+                "vehicle_events": result.get("vehicle_events", []),
+                "stage_timings": result.get("stage_timings", {}),
+                "overlay": overlay_state(result),
+                "size": os.path.getsize(video_path),
+                "last_used": time.time(),
+            }
+            self._evict(index, keep=output_filename)
+            self._save(index)
+
+    def trim(self):
+        """Evict OUTPUT_DIR down to max_bytes without adding an entry"""
+        with self._locked():
+            index = self._load()
+            if self._evict(index):
+                self._save(index)
+
+    def _evict(self, index, keep=None):
+        """Delete files from OUTPUT_DIR until it fits; returns True if `index` changed"""
+        by_filename = {entry["output_filename"]: key for key, entry in index.items()}
+        now = time.time()
+        total = 0
+        candidates = []  # (last used, size, filename)
+        for dir_entry in os.scandir(OUTPUT_DIR):
+            if not dir_entry.is_file() or dir_entry.name.startswith("."):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except OSError:
+                continue
+            total += stat.st_size
+            if dir_entry.name == keep or now - stat.st_mtime < WRITE_GRACE_SECONDS:
+                continue
+            key = by_filename.get(dir_entry.name)
+            last_used = index[key]["last_used"] if key else stat.st_mtime
+            candidates.append((last_used, stat.st_size, dir_entry.name))
+
+        changed = False
+        for _, size, filename in sorted(candidates):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(OUTPUT_DIR, filename))
+            except OSError:
+                continue
+            total -= size
+            key = by_filename.get(filename)
+            if key:
+                del index[key]
+                changed = True
+                print(f"🗑 Evicted cached analysis {filename}")
+            else:
+                print(f"🗑 Evicted output {filename}")
+        return changed
+
+
+# Global instance
+result_cache = ResultCache()
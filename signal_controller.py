@@ -1,232 +1,498 @@
+import math
+import json
 import time
+import heapq
 import threading
 import sqlite3
 
+from startup import LazySubsystem
+from database import db
+
 # Signal timing constants
 GREEN_TIME = 10
 YELLOW_TIME = 5
+MAX_EMERGENCY_GREEN = 60  # repeated requests extend an emergency green up to this many seconds
 
-class TrafficSignalController:
-    def __init__(self):
-        # Each junction has its own signal state
-        self.junctions = {
-            "Main Square Junction": {
-                "lanes": ["LANE_1", "LANE_2", "LANE_3", "LANE_4"],
-                "current_index": 0,
-                "current_green": "LANE_1",
-                "current_phase": "GREEN",
-                "mode": "NORMAL",
-                "emergency_lane": None,
-                "timer": GREEN_TIME,  # Timer for current phase
-                "last_update": time.time()
-            },
-            "Tech Park Crossing": {
-                "lanes": ["LANE_1", "LANE_2", "LANE_3", "LANE_4"],
-                "current_index": 0,
-                "current_green": "LANE_1",
-                "current_phase": "GREEN",
-                "mode": "NORMAL",
-                "emergency_lane": None,
-                "timer": GREEN_TIME,
-                "last_update": time.time()
-            },
-            "River Bridge Intersection": {
-                "lanes": ["LANE_1", "LANE_2", "LANE_3"],
-                "current_index": 0,
-                "current_green": "LANE_1",
-                "current_phase": "GREEN",
-                "mode": "NORMAL",
-                "emergency_lane": None,
-                "timer": GREEN_TIME,
-                "last_update": time.time()
+_LANE_NAMES = {}  # total_lanes -> ("LANE_1", ...), shared by all junctions of that size
+
+
+def lane_names(total_lanes):
+    total_lanes = max(1, int(total_lanes or 1))
+    if total_lanes not in _LANE_NAMES:
+        _LANE_NAMES[total_lanes] = tuple(f"LANE_{i}" for i in range(1, total_lanes + 1))
+    return _LANE_NAMES[total_lanes]
+
+
+class PreemptionRequest:
+    """Emergency green requested for one lane; repeated requests are merged into it"""
+
+    __slots__ = ("lane", "priority", "arrived", "requests")
+
+    def __init__(self, lane, priority, arrived):
+        self.lane = lane
+        self.priority = priority
+        self.arrived = arrived  # time.monotonic() of the first request
+        self.requests = 1
+
+    def sort_key(self):
+        # Higher priority first, then first come first served
+        return (-self.priority, self.arrived)
+
+    def as_tuple(self):
+        return (self.lane, self.priority, self.arrived, self.requests)
+
+
+class JunctionState:
+    """Signal state of one junction (one compact record per junction, no per-junction dict)"""
+
+    __slots__ = (
+        "id", "name", "lanes", "current_index", "current_green", "current_phase", "mode",
+        "emergency_lane",
+        "pending_lane",  # lane waiting for its emergency green
+        "phase_start",   # time.monotonic() at which the current phase began
+        "deadline",      # time.monotonic() at which the current phase ends
+        "generation",
+        "preemption",    # PreemptionRequest being served, or None
+        "queue",         # waiting PreemptionRequests in service order, or None
+    )
+
+    def __init__(self, junction_id, name, total_lanes):
+        self.id = junction_id
+        self.name = name
+        self.lanes = lane_names(total_lanes)
+        self.current_index = 0
+        self.current_green = self.lanes[0]
+        self.current_phase = "GREEN"
+        self.mode = "NORMAL"
+        self.emergency_lane = None
+        self.pending_lane = None
+        self.phase_start = 0.0
+        self.deadline = 0.0
+        self.generation = 0
+        self.preemption = None
+        self.queue = None
+
+
+class StatusSnapshot:
+    """
+    Immutable status of one junction, published on every phase change.
+
+    `summary` is the junction's /all-junctions-status entry and
+    `summary_json` the same entry already serialized. The /junction-status
+    body contains the countdown, so it is serialized at most once per
+    second and reused by every reader until the next second. The summary
+    only lists the preemption queue while it is not empty.
+    """
+
+    __slots__ = ("version", "junction_name", "summary", "summary_json", "_detail", "_deadline", "_rendered")
+
+    def __init__(self, version, junction, priority_enabled, priority_duration):
+        self.version = version
+        self.junction_name = junction.name
+        self.summary = {
+            "mode": junction.mode,
+            "signals": {
+                lane: junction.current_phase if lane == junction.current_green else "RED"
+                for lane in junction.lanes
             },
-            "Mall Circle Junction": {
-                "lanes": ["LANE_1", "LANE_2", "LANE_3", "LANE_4"],
-                "current_index": 0,
-                "current_green": "LANE_1",
-                "current_phase": "GREEN",
-                "mode": "NORMAL",
-                "emergency_lane": None,
-                "timer": GREEN_TIME,
-                "last_update": time.time()
+            "emergency_lane": junction.emergency_lane
+        }
+        if junction.queue:
+            self.summary["preemption_queue"] = [request.lane for request in junction.queue]
+        self.summary_json = json.dumps(self.summary).encode()
+        self._detail = (
+            priority_enabled,
+            priority_duration,
+            junction.preemption.as_tuple() if junction.preemption else None,
+            tuple(request.as_tuple() for request in junction.queue or ()),
+        )
+        self._deadline = junction.deadline
+        self._rendered = (None, None)  # (timer, serialized detail)
+
+    def timer(self):
+        """Seconds left in the current phase, derived from its deadline"""
+        return max(0, math.ceil(self._deadline - time.monotonic()))
+
+    def detail(self, timer=None):
+        """The /junction-status body (a fresh dict, callers may modify it)"""
+        timer = self.timer() if timer is None else timer
+        summary = self.summary
+        priority_enabled, priority_duration, active, queue = self._detail
+        now = time.monotonic()
+
+        def request(entry):
+            lane, priority, arrived, requests = entry
+            return {"lane": lane, "priority": priority, "requests": requests, "waiting": int(now - arrived)}
+
+        return {
+            "junction_name": self.junction_name,
+            "mode": summary["mode"],
+            "signals": {
+                lane: {"color": color, "timer": timer if color != "RED" else 0}
+                for lane, color in summary["signals"].items()
             },
-            "University Crossing": {
-                "lanes": ["LANE_1", "LANE_2", "LANE_3", "LANE_4"],
-                "current_index": 0,
-                "current_green": "LANE_1",
-                "current_phase": "GREEN",
-                "mode": "NORMAL",
-                "emergency_lane": None,
-                "timer": GREEN_TIME,
-                "last_update": time.time()
+            "emergency_lane": summary["emergency_lane"],
+            "priority_enabled": priority_enabled,
+            "priority_duration": priority_duration,
+            "preemption": {
+                "active": request(active) if active else None,
+                "queue": [request(entry) for entry in queue]
             }
         }
-        
+
+    def detail_json(self):
+        """(timer, serialized detail) for the current second"""
+        timer = self.timer()
+        rendered = self._rendered
+        if rendered[0] != timer:
+            # Readers racing here serialize the same bytes; the tuple swap is atomic
+            rendered = (timer, json.dumps(self.detail(timer)).encode())
+            self._rendered = rendered
+        return rendered
+
+
+class TrafficSignalController:
+    """
+    Signal phases of all junctions, driven by a single scheduler thread.
+
+    Every junction stores the (monotonic) deadline of its current phase and
+    the scheduler sleeps until the earliest deadline in a heap, then applies
+    that junction's next transition. Timers are derived from the deadline
+    when read, so nothing polls. Rescheduling a junction bumps its
+    `generation`; heap entries from older generations are stale and are
+    dropped when popped.
+
+    Every phase change publishes a new StatusSnapshot of that junction
+    under a global `version`. The status methods only read published
+    snapshots and never take the lock.
+
+    Junctions come from the `junctions` table and are kept as
+    JunctionState records keyed by junction ID; they can be added and
+    removed while the scheduler runs.
+    """
+
+    def __init__(self):
+        self.junctions = {}  # junction id -> JunctionState
+        self._ids = {}       # junction name -> junction id
+
         self.priority_enabled = True
         self.priority_duration = 15
         self.lock = threading.Lock()
-        
-        # Start timer update thread
-        threading.Thread(target=self._update_timers, daemon=True).start()
-        
-        # Start normal cycles for all junctions
-        for junction_name in self.junctions.keys():
-            threading.Thread(
-                target=self._normal_cycle, 
-                args=(junction_name,), 
-                daemon=True
-            ).start()
-
-    def _update_timers(self):
-        """Update timers for all junctions"""
-        while True:
-            with self.lock:
-                current_time = time.time()
-                for junction_name, junction in self.junctions.items():
-                    if junction["mode"] == "NORMAL":
-                        elapsed = current_time - junction["last_update"]
-                        if elapsed >= 1:  # Update every second
-                            junction["timer"] = max(0, junction["timer"] - int(elapsed))
-                            junction["last_update"] = current_time
-                            
-                            # Reset timer when it reaches 0
-                            if junction["timer"] <= 0:
-                                if junction["current_phase"] == "GREEN":
-                                    junction["timer"] = YELLOW_TIME
-                                elif junction["current_phase"] == "YELLOW":
-                                    junction["timer"] = GREEN_TIME
-            time.sleep(0.5)  # Check every half second
-
-    def _normal_cycle(self, junction_name):
-        """Normal signal cycle for a specific junction"""
-        while True:
-            with self.lock:
-                junction = self.junctions[junction_name]
-                if junction["mode"] != "NORMAL":
-                    time.sleep(1)
-                    continue
-                
-                # Set green phase
-                junction["current_green"] = junction["lanes"][junction["current_index"]]
-                junction["current_phase"] = "GREEN"
-                junction["timer"] = GREEN_TIME
-                junction["last_update"] = time.time()
-
-            time.sleep(GREEN_TIME)
-
-            with self.lock:
-                if self.junctions[junction_name]["mode"] != "NORMAL":
-                    continue
-                # Set yellow phase
-                junction["current_phase"] = "YELLOW"
-                junction["timer"] = YELLOW_TIME
-                junction["last_update"] = time.time()
-
-            time.sleep(YELLOW_TIME)
-
-            with self.lock:
-                if self.junctions[junction_name]["mode"] == "NORMAL":
-                    # Move to next lane
-                    junction = self.junctions[junction_name]
-                    junction["current_index"] = (junction["current_index"] + 1) % len(junction["lanes"])
+        self._wakeup = threading.Condition(self.lock)
+        self._deadlines = []  # heap of (deadline, generation, junction_id)
+
+        self.version = 0
+        self._snapshots = {}  # junction_name -> StatusSnapshot
+        self._all_status = (None, {}, b"{}")  # (version, status, serialized status)
+        self._listeners = []  # called with (junction_name, snapshot or None when removed)
+
+        self.reload_junctions()
+        threading.Thread(target=self._run_scheduler, daemon=True).start()
+
+    # ---------------- junction registry ----------------
+
+    def reload_junctions(self):
+        """Sync with the `junctions` table: start new junctions, drop deleted ones"""
+        rows = db.get_junctions_list()
+        with self.lock:
+            now = time.monotonic()
+            listed = {row["id"] for row in rows}
+            for junction_id in [i for i in self.junctions if i not in listed]:
+                self._remove(junction_id)
+            for row in rows:
+                junction = self.junctions.get(row["id"])
+                if junction is None or junction.name != row["name"] or len(junction.lanes) != len(lane_names(row["lanes"])):
+                    if junction is not None:
+                        self._remove(junction.id)
+                    self._add(row["id"], row["name"], row["lanes"], now)
+        return len(rows)
+
+    def add_junction(self, junction_name, total_lanes=4, location=None, description=None):
+        """Store a new junction and start its signal cycle; returns its ID"""
+        junction_id = db.add_junction(junction_name, total_lanes, location, description)
+        with self.lock:
+            self._add(junction_id, junction_name, total_lanes, time.monotonic())
+        return junction_id
+
+    def remove_junction(self, junction_name):
+        """Delete a junction and stop its signal cycle; False if it is unknown"""
+        with self.lock:
+            junction_id = self._ids.get(junction_name)
+            if junction_id is None:
+                return False
+            self._remove(junction_id)
+        db.remove_junction(junction_id)
+        return True
+
+    def _add(self, junction_id, junction_name, total_lanes, now):
+        junction = JunctionState(junction_id, junction_name, total_lanes)
+        self.junctions[junction_id] = junction
+        self._ids[junction_name] = junction_id
+        self._enter_phase(junction, "GREEN", GREEN_TIME, now)
+
+    def _remove(self, junction_id):
+        # Its heap entries become stale and are dropped when they come due
+        junction = self.junctions.pop(junction_id)
+        del self._ids[junction.name]
+        self._snapshots.pop(junction.name, None)
+        self.version += 1
+        for listener in self._listeners:
+            listener(junction.name, None)
+
+    def _junction(self, junction_name):
+        junction_id = self._ids.get(junction_name)
+        return self.junctions[junction_id] if junction_id is not None else None
+
+    # ---------------- scheduling (caller holds self.lock) ----------------
+
+    def _enter_phase(self, junction, phase, duration, start):
+        """Switch to `phase` for `duration` seconds from `start` and schedule its end"""
+        junction.current_phase = phase
+        junction.phase_start = start
+        self._reschedule(junction, start + duration)
+
+    def _reschedule(self, junction, deadline):
+        """Move the end of the current phase to `deadline`"""
+        junction.deadline = deadline
+        junction.generation += 1
+
+        entry = (deadline, junction.generation, junction.id)
+        heapq.heappush(self._deadlines, entry)
+        if self._deadlines[0] is entry:
+            self._wakeup.notify()  # earlier than what the scheduler sleeps on
+        self._publish(junction)
+
+    def _publish(self, junction):
+        snapshot = StatusSnapshot(self.version + 1, junction, self.priority_enabled, self.priority_duration)
+        previous = self._snapshots.get(junction.name)
+        self._snapshots[junction.name] = snapshot
+        # Only after the snapshot is stored: a reader that sees the new
+        # version must also see the snapshot (see _current_all_status)
+        self.version = snapshot.version
+        if previous is not None and previous.summary_json == snapshot.summary_json:
+            return  # e.g. a merged duplicate request; nothing listeners show changed
+        for listener in self._listeners:
+            listener(junction.name, snapshot)
+
+    def _publish_all(self):
+        for junction in self.junctions.values():
+            self._publish(junction)
+
+    def _resume_normal(self, junction, now, after_lane=None):
+        junction.mode = "NORMAL"
+        junction.emergency_lane = None
+        junction.pending_lane = None
+        junction.preemption = None
+        junction.queue = None
+        if after_lane in junction.lanes:
+            junction.current_index = (junction.lanes.index(after_lane) + 1) % len(junction.lanes)
+        junction.current_green = junction.lanes[junction.current_index]
+        self._enter_phase(junction, "GREEN", GREEN_TIME, now)
+
+    def _advance(self, junction, now):
+        """Apply the transition due at `now` for one junction"""
+        if junction.mode == "NORMAL":
+            if junction.current_phase == "GREEN":
+                self._enter_phase(junction, "YELLOW", YELLOW_TIME, now)
+            else:
+                # Move to next lane
+                junction.current_index = (junction.current_index + 1) % len(junction.lanes)
+                junction.current_green = junction.lanes[junction.current_index]
+                self._enter_phase(junction, "GREEN", GREEN_TIME, now)
+
+        elif junction.pending_lane is not None:
+            # Crossing traffic has cleared, give the emergency lane green
+            self._emergency_green(junction, now)
+
+        elif junction.current_phase == "GREEN":
+            self._enter_phase(junction, "YELLOW", YELLOW_TIME, now)
+
+        elif junction.queue:
+            # The closing yellow also cleared the junction for the next queued lane
+            junction.preemption = junction.queue.pop(0)
+            junction.pending_lane = junction.preemption.lane
+            if not junction.queue:
+                junction.queue = None
+            self._emergency_green(junction, now)
+
+        else:
+            self._resume_normal(junction, now, after_lane=junction.emergency_lane)
+
+    def _emergency_green(self, junction, now):
+        junction.emergency_lane = junction.pending_lane
+        junction.current_green = junction.pending_lane
+        junction.pending_lane = None
+        self._enter_phase(junction, "GREEN", self.priority_duration, now)
+
+    def _preempt(self, junction, lane, priority, now):
+        """Merge one emergency request into the junction's preemption state; returns what happened"""
+        if junction.mode == "NORMAL":
+            junction.mode = "EMERGENCY"
+            junction.preemption = PreemptionRequest(lane, priority, now)
+            junction.pending_lane = lane
+            if junction.current_phase == "YELLOW":
+                # Already clearing the junction, keep the running yellow
+                self._publish(junction)
+            elif junction.current_green == lane:
+                self._emergency_green(junction, now)
+            else:
+                self._enter_phase(junction, "YELLOW", YELLOW_TIME, now)
+            return "started"
+
+        active = junction.preemption
+        if active is not None and active.lane == lane:
+            if junction.pending_lane == lane:
+                active.requests += 1
+                active.priority = max(active.priority, priority)
+                self._publish(junction)
+                return "merged"
+            if junction.current_phase == "GREEN":
+                active.requests += 1
+                active.priority = max(active.priority, priority)
+                deadline = min(
+                    max(junction.deadline, now + self.priority_duration),
+                    junction.phase_start + max(MAX_EMERGENCY_GREEN, self.priority_duration),
+                )
+                if deadline > junction.deadline:
+                    self._reschedule(junction, deadline)
+                    return "extended"
+                self._publish(junction)
+                return "merged"
+
+        # A different lane, or the same lane after its green ended: wait in the queue
+        queue = junction.queue if junction.queue is not None else []
+        for request in queue:
+            if request.lane == lane:
+                request.requests += 1
+                request.priority = max(request.priority, priority)
+                outcome = "merged"
+                break
+        else:
+            queue.append(PreemptionRequest(lane, priority, now))
+            outcome = "queued"
+        queue.sort(key=PreemptionRequest.sort_key)
+        junction.queue = queue
+        self._publish(junction)
+        return outcome
+
+    def _run_scheduler(self):
+        """Fire phase transitions as their deadlines come due"""
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    deadline, generation, junction_id = heapq.heappop(self._deadlines)
+                    junction = self.junctions.get(junction_id)
+                    if junction is not None and junction.generation == generation:
+                        # Next phase starts at the old deadline, so cycles do not drift
+                        self._advance(junction, deadline)
+
+                timeout = self._deadlines[0][0] - now if self._deadlines else None
+                self._wakeup.wait(timeout)
+
+    def add_listener(self, listener):
+        """
+        Call `listener(junction_name, snapshot)` on every phase change
+        (snapshot is None when the junction was removed). It runs under the
+        lock and must not block.
+        """
+        with self.lock:
+            self._listeners.append(listener)
+
+    # ---------------- status (lock-free) ----------------
+
+    def get_snapshot(self, junction_name):
+        """Latest published StatusSnapshot of a junction, or None"""
+        return self._snapshots.get(junction_name)
 
     def get_junction_status(self, junction_name):
         """Get status for specific junction including timer"""
-        if junction_name not in self.junctions:
+        snapshot = self._snapshots.get(junction_name)
+        return snapshot.detail() if snapshot is not None else None
+
+    def get_junction_status_json(self, junction_name):
+        """(etag, serialized status) of one junction, or None"""
+        snapshot = self._snapshots.get(junction_name)
+        if snapshot is None:
             return None
-            
-        with self.lock:
-            junction = self.junctions[junction_name]
-            signals = {}
-            for lane in junction["lanes"]:
-                if lane == junction["current_green"]:
-                    signals[lane] = {
-                        "color": junction["current_phase"],
-                        "timer": max(0, junction["timer"])
-                    }
-                else:
-                    signals[lane] = {
-                        "color": "RED",
-                        "timer": 0
-                    }
-
-            return {
-                "junction_name": junction_name,
-                "mode": junction["mode"],
-                "signals": signals,
-                "emergency_lane": junction["emergency_lane"],
-                "priority_enabled": self.priority_enabled,
-                "priority_duration": self.priority_duration
-            }
+        timer, body = snapshot.detail_json()
+        return f"{snapshot.version}-{timer}", body
+
+    def _current_all_status(self):
+        cached = self._all_status
+        version = self.version  # read before the snapshots, writers bump it after storing them
+        if cached[0] != version:
+            # Rebuilt once per version from the per-junction snapshots. A
+            # racing publish can only make the body newer than `version`,
+            # which the next read rebuilds anyway.
+            snapshots = list(self._snapshots.values())
+            status = {snapshot.junction_name: snapshot.summary for snapshot in snapshots}
+            body = b"{" + b", ".join(
+                json.dumps(snapshot.junction_name).encode() + b": " + snapshot.summary_json
+                for snapshot in snapshots
+            ) + b"}"
+            cached = (version, status, body)
+            self._all_status = cached
+        return cached
 
     def get_all_junctions_status(self):
-        """Get status for all junctions with timers"""
+        """Get status for all junctions (a shared snapshot, do not modify it)"""
+        return self._current_all_status()[1]
+
+    def get_all_junctions_status_json(self):
+        """(version, serialized status of all junctions)"""
+        version, _, body = self._current_all_status()
+        return version, body
+
+    # ---------------- control ----------------
+
+    def trigger_emergency(self, lane, junction_name, priority=0):
+        """
+        Trigger emergency for specific lane at specific junction:
+        yellow to clear the junction, green for the emergency lane for
+        `priority_duration`, yellow, then the normal cycle resumes with the
+        lane after it.
+
+        Requests are coalesced per junction. Repeating the lane being
+        served extends its green (up to MAX_EMERGENCY_GREEN) instead of
+        restarting the sequence. Other lanes queue and are served one after
+        another, higher `priority` first, then in arrival order. Returns
+        "started", "extended", "merged" or "queued", or None if the
+        request was ignored.
+        """
+        if not self.priority_enabled:
+            return None
+
+        with self.lock:
+            junction = self._junction(junction_name)
+            if junction is None:
+                return None
+            return self._preempt(junction, lane, priority, time.monotonic())
+
+    def reset_junction(self, junction_name):
+        """Cancel any emergency (and queued requests) and restart the normal cycle at one junction"""
+        with self.lock:
+            junction = self._junction(junction_name)
+            if junction is not None:
+                self._resume_normal(junction, time.monotonic())
+
+    def reset(self):
+        """Reset every junction to its normal cycle"""
+        with self.lock:
+            now = time.monotonic()
+            for junction in self.junctions.values():
+                self._resume_normal(junction, now)
+
+    def set_duration(self, seconds):
+        """Green time given to emergency lanes (applies from the next emergency green)"""
+        with self.lock:
+            self.priority_duration = seconds
+            self._publish_all()
+
+    def toggle_priority(self, enabled):
         with self.lock:
-            status = {}
-            for junction_name, junction in self.junctions.items():
-                signals = {}
-                for lane in junction["lanes"]:
-                    if lane == junction["current_green"]:
-                        signals[lane] = junction["current_phase"]
-                    else:
-                        signals[lane] = "RED"
-                
-                status[junction_name] = {
-                    "mode": junction["mode"],
-                    "signals": signals,
-                    "emergency_lane": junction["emergency_lane"]
-                }
-            return status
-
-    def trigger_emergency(self, lane, junction_name):
-        """Trigger emergency for specific lane at specific junction"""
-        if not self.priority_enabled or junction_name not in self.junctions:
-            return
-
-        def emergency_flow():
-            with self.lock:
-                junction = self.junctions[junction_name]
-                junction["mode"] = "EMERGENCY"
-                junction["current_phase"] = "YELLOW"
-                junction["timer"] = YELLOW_TIME
-                junction["last_update"] = time.time()
-
-            time.sleep(YELLOW_TIME)
-
-            with self.lock:
-                junction = self.junctions[junction_name]
-                junction["emergency_lane"] = lane
-                junction["current_green"] = lane
-                junction["current_phase"] = "GREEN"
-                junction["timer"] = self.priority_duration
-                junction["last_update"] = time.time()
-
-            time.sleep(self.priority_duration)
-
-            with self.lock:
-                junction = self.junctions[junction_name]
-                junction["current_phase"] = "YELLOW"
-                junction["timer"] = YELLOW_TIME
-                junction["last_update"] = time.time()
-
-            time.sleep(YELLOW_TIME)
-
-            with self.lock:
-                junction = self.junctions[junction_name]
-                junction["mode"] = "NORMAL"
-                junction["emergency_lane"] = None
-                # Find index of the emergency lane
-                if lane in junction["lanes"]:
-                    lane_index = junction["lanes"].index(lane)
-                    junction["current_index"] = (lane_index + 1) % len(junction["lanes"])
-                    junction["current_green"] = junction["lanes"][junction["current_index"]]
-                junction["current_phase"] = "GREEN"
-                junction["timer"] = GREEN_TIME
-                junction["last_update"] = time.time()
-
-        threading.Thread(target=emergency_flow, daemon=True).start()
-
-    # ... rest of the methods remain the same ...
+            self.priority_enabled = enabled
+            self._publish_all()
 
     def get_status(self):
          """
@@ -236,5 +502,5 @@ class TrafficSignalController:
          return self.get_all_junctions_status()
 
 
-# Global instance
-controller = TrafficSignalController()
\ No newline at end of file
+# Global instance (the scheduler thread starts on first use, not at import)
+controller = LazySubsystem("signal_controller", TrafficSignalController)
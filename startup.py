@@ -0,0 +1,78 @@
+import os
+import time
+import importlib
+import threading
+
+# Seconds each subsystem took to initialize, in this process
+STARTUP_TIMINGS = {}
+_subsystems = {}
+# Module that registers each subsystem, so warm_up() can import it on demand
+SUBSYSTEM_MODULES = {
+    "database": "database",
+    "signal_controller": "signal_controller",
+    "model": "emergency_core",
+}
+
+
+class LazySubsystem:
+    """
+    Stand-in for a module-level singleton that is expensive to build.
+
+    The real object is created by `factory` on first attribute access or
+    call (or by warm_up()), and the time it took is recorded in
+    STARTUP_TIMINGS. Existing `from module import name` call sites keep
+    working unchanged.
+    """
+
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        _subsystems[name] = self
+
+    @property
+    def loaded(self):
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    start = time.perf_counter()
+                    instance = self._factory()
+                    STARTUP_TIMINGS[self._name] = round(time.perf_counter() - start, 3)
+                    print(f"⏱ {self._name} initialized in {STARTUP_TIMINGS[self._name]}s")
+                    self._instance = instance
+        return self._instance
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+
+def record_timing(name, seconds):
+    """Record a startup step that is not a LazySubsystem (e.g. app import)"""
+    STARTUP_TIMINGS[name] = round(seconds, 3)
+
+
+def warm_up(names=None):
+    """Initialize the named subsystems (all of SUBSYSTEM_MODULES by default)"""
+    for name in names or list(SUBSYSTEM_MODULES):
+        if name not in _subsystems and name in SUBSYSTEM_MODULES:
+            importlib.import_module(SUBSYSTEM_MODULES[name])
+        if name in _subsystems:
+            _subsystems[name].get()
+        else:
+            print(f"⚠ Unknown subsystem '{name}'")
+    return startup_report()
+
+
+def startup_report():
+    return {
+        "pid": os.getpid(),
+        "timings": dict(STARTUP_TIMINGS),
+        "subsystems": {name: s.loaded for name, s in _subsystems.items()},
+    }
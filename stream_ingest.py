@@ -0,0 +1,433 @@
+"""
+Continuous ingestion of the `video_sources` cameras in config.json.
+
+One reader thread per camera keeps only the newest frame in a slot
+(older unread frames are dropped, so latency never builds up). A small
+pool of model workers, each with its own detector instance, takes frames
+round-robin across cameras - at most one frame per camera per batch and
+one batch per camera in flight - so a busy camera cannot starve the
+others. Confirmed emergency vehicles go through the same side effects as
+uploaded videos.
+
+    python stream_ingest.py                       # all video_sources
+    python stream_ingest.py --camera cam3=rtsp://10.0.0.3/stream --junction cam3="Tech Park Crossing"
+
+Files are looped and paced at their own FPS to stand in for live cameras.
+A video_sources entry may set `stream_url` (used instead of `path`) and
+`junction` (defaults to the camera name).
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from collections import deque
+
+from detection_zones import zone_crops, source_zones
+from vehicle_tracker import VehicleTracker
+
+# ================= CONFIG =================
+CONFIG_PATH = "config.json"
+MODEL_WORKERS = int(os.environ.get("STREAM_MODEL_WORKERS", 2))  # shared detector instances
+MAX_BATCH = 8             # cameras per model call
+STALE_AFTER = 1.0         # seconds; older frames are dropped instead of inferred
+RECONNECT_DELAY = 5.0     # seconds between attempts to reopen a dead source
+METRICS_WINDOW = 10.0     # seconds of history behind the FPS figures
+LAG_SMOOTHING = 0.2       # EWMA weight of the newest capture-to-result lag
+REARM_AFTER = 30.0        # seconds after a clear before a new track may clear the next scheduled emergency
+# =========================================
+
+
+class RateMeter:
+    """Events per second over the last METRICS_WINDOW seconds"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self.ticks = deque()
+        self.lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = now or time.monotonic()
+        with self.lock:
+            self.ticks.append(now)
+            self._prune(now)
+
+    def _prune(self, now):
+        while self.ticks and now - self.ticks[0] > self.window:
+            self.ticks.popleft()
+
+    def rate(self):
+        now = time.monotonic()
+        with self.lock:
+            self._prune(now)
+            if len(self.ticks) < 2:
+                return 0.0
+            return round(len(self.ticks) / max(now - self.ticks[0], 1e-6), 2)
+
+
+class CameraStream:
+    """One source: reader thread, latest-frame slot, tracker and metrics"""
+
+    def __init__(self, name, source, junction=None, zones=None):
+        self.name = name
+        self.source = source
+        self.junction = junction or name
+        self.zones = zones or []
+        self.regions = None  # zone crops, computed from the first frame's size
+
+        self.lock = threading.Lock()
+        self.frame = None
+        self.captured_at = None
+        self.frame_index = 0
+        self.in_flight = False
+        self.tracker = VehicleTracker()
+        # (scheduled emergency, analysis state, cleared_at) of the emergency
+        # this camera is serving; outlives tracks so it is cleared only once
+        self.emergency = None
+
+        self.connected = False
+        self.last_error = None
+        self.read_meter = RateMeter()
+        self.infer_meter = RateMeter()
+        self.frames_read = 0
+        self.frames_inferred = 0
+        self.dropped_frames = 0   # overwritten in the slot before a worker took them
+        self.stale_frames = 0     # taken, but too old to be worth inferring
+        self.lag_ms = None
+        self.max_lag_ms = 0.0
+
+    def run(self, stop_event, notify):
+        """Reader thread: keep the newest frame in the slot, reconnect on failure"""
+        import cv2
+
+        is_file = os.path.isfile(self.source)
+        while not stop_event.is_set():
+            cap = cv2.VideoCapture(self.source)
+            if not cap.isOpened():
+                self.connected = False
+                self.last_error = f"could not open {self.source}"
+                print(f"⚠ {self.name}: {self.last_error}, retrying in {RECONNECT_DELAY}s")
+                stop_event.wait(RECONNECT_DELAY)
+                continue
+
+            self.connected = True
+            frame_interval = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 25)
+            next_frame_at = time.monotonic()
+            read_this_pass = 0
+
+            while not stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    if is_file and read_this_pass:
+                        # Loop recorded clips to stand in for a live camera
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        read_this_pass = 0
+                        continue
+                    self.last_error = "stream ended"
+                    break
+                read_this_pass += 1
+
+                if is_file:
+                    next_frame_at += frame_interval
+                    delay = next_frame_at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    elif delay < -1.0:
+                        next_frame_at = time.monotonic()  # fell behind, don't burst
+
+                self._publish(frame)
+                notify()
+
+            cap.release()
+            self.connected = False
+            if not stop_event.is_set():
+                stop_event.wait(RECONNECT_DELAY)
+
+    def _publish(self, frame):
+        with self.lock:
+            if self.frame is not None:
+                self.dropped_frames += 1
+            self.frame = frame
+            self.captured_at = time.time()
+            self.frame_index += 1
+            self.frames_read += 1
+        self.read_meter.tick()
+
+    def take(self):
+        """Newest unread frame as (frame, captured_at, frame_index), or None if empty/busy"""
+        with self.lock:
+            if self.frame is None or self.in_flight:
+                return None
+            item = (self.frame, self.captured_at, self.frame_index)
+            self.frame = None
+            self.in_flight = True
+            return item
+
+    def done(self, captured_at=None):
+        """Release the camera for scheduling; record lag when a frame was inferred"""
+        with self.lock:
+            self.in_flight = False
+            if captured_at is None:
+                return
+            lag = (time.time() - captured_at) * 1000
+            self.lag_ms = lag if self.lag_ms is None else (1 - LAG_SMOOTHING) * self.lag_ms + LAG_SMOOTHING * lag
+            self.max_lag_ms = max(self.max_lag_ms, lag)
+            self.frames_inferred += 1
+        self.infer_meter.tick()
+
+    def crop_regions(self, frame):
+        if self.regions is None:
+            h, w = frame.shape[:2]
+            self.regions = zone_crops(self.zones, w, h) or [(0, 0, w, h)]
+        return self.regions
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "junction": self.junction,
+                "source": self.source,
+                "connected": self.connected,
+                "read_fps": self.read_meter.rate(),
+                "inferred_fps": self.infer_meter.rate(),
+                "frames_read": self.frames_read,
+                "frames_inferred": self.frames_inferred,
+                "dropped_frames": self.dropped_frames,
+                "stale_frames": self.stale_frames,
+                "lag_ms": round(self.lag_ms, 1) if self.lag_ms is not None else None,
+                "max_lag_ms": round(self.max_lag_ms, 1),
+                "active_tracks": len(self.tracker.tracks),
+                "last_error": self.last_error,
+            }
+
+
+def load_cameras(config_path=CONFIG_PATH, names=None):
+    """CameraStreams for the config.json `video_sources` (optionally only `names`)"""
+    with open(config_path) as f:
+        sources = json.load(f).get("video_sources", {})
+
+    cameras = []
+    for name, source in sources.items():
+        if names and name not in names:
+            continue
+        cameras.append(CameraStream(
+            name,
+            source.get("stream_url") or source["path"],
+            junction=source.get("junction"),
+            zones=source_zones(source),
+        ))
+    return cameras
+
+
+class StreamIngest:
+    """
+    Fair scheduler of many camera streams onto a few shared detectors.
+
+    Workers pull batches with `_next_batch()`: cameras are scanned
+    round-robin from where the previous batch stopped, each contributing
+    its newest frame if it has one and is not already being inferred.
+    Frames older than STALE_AFTER are counted and skipped rather than
+    inferred late.
+    """
+
+    def __init__(self, workers=MODEL_WORKERS, max_batch=MAX_BATCH):
+        self.workers = workers
+        self.max_batch = max_batch
+        self.cameras = []
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.next_camera = 0
+        self.started_at = None
+        self.batches = 0
+        self.batch_frames = 0
+        self.running = False
+
+    def start(self, cameras=None):
+        """Start reader threads and model workers (cameras default to config.json)"""
+        if self.running:
+            return
+        self.cameras = cameras if cameras is not None else load_cameras()
+        if not self.cameras:
+            print("⚠ No cameras configured for stream ingestion")
+            return
+
+        self.stop_event.clear()
+        self.started_at = time.time()
+        self.running = True
+        for camera in self.cameras:
+            threading.Thread(
+                target=camera.run, args=(self.stop_event, self._notify),
+                name=f"camera-{camera.name}", daemon=True
+            ).start()
+        for worker_id in range(self.workers):
+            threading.Thread(
+                target=self._worker, args=(worker_id,),
+                name=f"stream-worker-{worker_id}", daemon=True
+            ).start()
+        print(f"📡 Ingesting {len(self.cameras)} camera(s) with {self.workers} model worker(s)")
+
+    def stop(self):
+        self.stop_event.set()
+        self.running = False
+        self._notify()
+
+    def _notify(self):
+        with self.condition:
+            self.condition.notify()
+
+    def _next_batch(self):
+        """Block until at least one camera has a fresh frame; return up to max_batch of them"""
+        with self.condition:
+            while not self.stop_event.is_set():
+                batch = []
+                count = len(self.cameras)
+                next_camera = (self.next_camera + 1) % count
+                for offset in range(count):
+                    position = (self.next_camera + offset) % count
+                    camera = self.cameras[position]
+                    item = camera.take()
+                    if item is None:
+                        continue
+
+                    frame, captured_at, frame_index = item
+                    if time.time() - captured_at > STALE_AFTER:
+                        camera.stale_frames += 1
+                        camera.done()
+                        continue
+
+                    batch.append((camera, frame, captured_at, frame_index))
+                    next_camera = (position + 1) % count
+                    if len(batch) >= self.max_batch:
+                        break
+
+                # Next scan starts after the last camera served
+                self.next_camera = next_camera
+                if batch:
+                    return batch
+                self.condition.wait(0.5)
+        return []
+
+    def _worker(self, worker_id):
+        from emergency_core import MODEL_PATH, CONF_THRESHOLD, EMERGENCY_CLASSES, extract_detections
+        from inference_backends import load_detector
+
+        # One detector per worker; torch/onnxruntime release the GIL while running
+        detector = load_detector(MODEL_PATH)
+
+        while not self.stop_event.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            served = 0
+            try:
+                inputs = []
+                for camera, frame, _, _ in batch:
+                    inputs.extend(frame[y1:y2, x1:x2] for x1, y1, x2, y2 in camera.crop_regions(frame))
+                results = iter(detector(inputs, conf=CONF_THRESHOLD, verbose=False))
+
+                self.batches += 1
+                self.batch_frames += len(batch)
+                for camera, frame, captured_at, frame_index in batch:
+                    detections = extract_detections(results, camera.crop_regions(frame))
+                    emergency = detections.filter(detections.class_mask(EMERGENCY_CLASSES)).rows()
+                    _, events = camera.tracker.update(frame_index, emergency)
+                    for event in events:
+                        self._handle_event(camera, event)
+                    camera.done(captured_at)
+                    served += 1
+            except Exception as e:
+                print(f"❌ Stream worker {worker_id} failed on a batch: {e}")
+                for camera, _, _, _ in batch[served:]:
+                    camera.last_error = str(e)
+                    camera.done()
+            self._notify()
+
+    def _handle_event(self, camera, event):
+        """
+        Confirmed vehicles get the same DB / signal side effects as an uploaded clip.
+
+        The analysis state is kept per scheduled emergency, so its junction
+        is cleared and the signal preempted once, however many tracks the
+        ambulance produces. Shortly after a clear, the next scheduled
+        emergency is already the active one; a vehicle confirmed within
+        REARM_AFTER seconds is taken to be the same ambulance picked up
+        again rather than the next one.
+        """
+        from emergency_core import handle_vehicle_event, new_analysis_state, get_active_emergency_for_junction
+
+        if event["event"] != "confirmed":
+            print(f"📡 {camera.name}: track #{event['track_id']} {event['label']} {event['event']}")
+            return
+
+        now = time.monotonic()
+        serving = camera.emergency
+        if serving is not None and serving[2] is not None and now - serving[2] < REARM_AFTER:
+            scheduled, state, _ = serving
+        else:
+            scheduled = get_active_emergency_for_junction(camera.junction)
+            if scheduled is None:
+                handle_vehicle_event(event, new_analysis_state(), camera.junction, None, camera.name)
+                return
+            if serving is not None and serving[0]["emergency_id"] == scheduled["emergency_id"]:
+                state = serving[1]
+            else:
+                state = new_analysis_state()
+
+        was_cleared = state["junction_cleared"]
+        handle_vehicle_event(event, state, camera.junction, scheduled, camera.name)
+        if state["junction_cleared"] and not was_cleared:
+            cleared_at = now
+        elif serving is not None and serving[1] is state:
+            cleared_at = serving[2]
+        else:
+            cleared_at = None
+        camera.emergency = (scheduled, state, cleared_at)
+
+    def metrics(self):
+        """Per-camera FPS, lag and drop counters plus scheduler totals"""
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else 0,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batch_frames / self.batches, 2) if self.batches else 0.0,
+            "cameras": {camera.name: camera.metrics() for camera in self.cameras},
+        }
+
+
+# Global instance
+ingest = StreamIngest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continuously analyze camera streams")
+    parser.add_argument("--camera", action="append", default=[], metavar="NAME=SOURCE",
+                        help="extra/override camera (file path or stream URL)")
+    parser.add_argument("--junction", action="append", default=[], metavar="NAME=JUNCTION")
+    parser.add_argument("--only", nargs="*", help="only these video_sources entries")
+    parser.add_argument("--workers", type=int, default=MODEL_WORKERS)
+    parser.add_argument("--metrics-every", type=float, default=10.0, help="seconds between metric printouts")
+    args = parser.parse_args()
+
+    junctions = dict(item.split("=", 1) for item in args.junction)
+    cameras = {camera.name: camera for camera in load_cameras(names=args.only)}
+    for item in args.camera:
+        name, source = item.split("=", 1)
+        cameras[name] = CameraStream(name, source)
+    for name, junction in junctions.items():
+        if name in cameras:
+            cameras[name].junction = junction
+
+    service = StreamIngest(workers=args.workers)
+    service.start(list(cameras.values()))
+    try:
+        while service.running:
+            time.sleep(args.metrics_every)
+            print(json.dumps(service.metrics(), indent=2))
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# test_analysis.py
+from types import SimpleNamespace
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+import emergency_core
+from database import TrafficDatabase
+from startup import LazySubsystem
+
+
+def _no_detections(inputs, **kwargs):
+    return [SimpleNamespace(boxes=[], names={0: "ambulance"}) for _ in inputs]
+
+
+def test_analysis_on_fresh_database(tmp_path, monkeypatch):
+    # No traffic_db.sqlite3 yet: the analysis itself has to create the schema
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(emergency_core, "db", LazySubsystem("fresh_database", TrafficDatabase))
+    monkeypatch.setattr(emergency_core, "model", _no_detections)
+
+    video_path = str(tmp_path / "clip.mp4")
+    out = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"mp4v"), 25, (320, 240))
+    for i in range(30):
+        out.write(np.full((240, 320, 3), i * 8, dtype=np.uint8))
+    out.release()
+
+    result = emergency_core.analyze_video(video_path, "Main Square Junction", detect_only=True)
+
+    assert result["emergency"] is False
+    assert result["stage_timings"]["frames"] == 30
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as mp:
+        test_analysis_on_fresh_database(Path(tmp), mp)
+    print("Fresh database analysis test passed")
@@ -0,0 +1,35 @@
+# test_inference_backends.py
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("ultralytics")
+
+from emergency_core import MODEL_PATH, CONF_THRESHOLD
+from inference_backends import compare_backends, PARITY_MIN_MATCH
+
+VALID_IMAGES = "project/datasets/emergency_vehicles/valid/images"
+PARITY_IMAGES = 20
+MAX_CONF_DIFF = 0.05  # ONNX Runtime vs torch on FP32 weights
+
+
+def test_onnx_backend_matches_torch():
+    if not os.path.exists(MODEL_PATH):
+        pytest.skip(f"{MODEL_PATH} not found")
+    images = sorted(Path(VALID_IMAGES).glob("*.jpg"))[:PARITY_IMAGES]
+    if not images:
+        pytest.skip(f"no validation images in {VALID_IMAGES}")
+
+    report = compare_backends(MODEL_PATH, images, ["onnx"], conf=CONF_THRESHOLD, warmup=1)
+    onnx = report["backends"]["onnx"]
+
+    # A box only matches a torch box of the same class
+    assert onnx["parity_match"] >= PARITY_MIN_MATCH, onnx
+    assert onnx["max_conf_diff"] <= MAX_CONF_DIFF, onnx
+
+
+if __name__ == "__main__":
+    test_onnx_backend_matches_torch()
+    print("ONNX parity test passed")
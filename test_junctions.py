@@ -0,0 +1,30 @@
+# test_junctions.py
+import os
+import sqlite3
+import tempfile
+
+from database import TrafficDatabase
+
+
+def test_duplicate_junction_does_not_lock_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = TrafficDatabase(os.path.join(tmp, "traffic_db.sqlite3"))
+        name = db.get_junctions_list()[0]["name"]
+
+        try:
+            db.add_junction(name, 4)
+        except sqlite3.IntegrityError:
+            pass
+        else:
+            raise AssertionError("duplicate junction name was accepted")
+
+        junction_id = db.add_junction("Zed", 4)
+        assert "Zed" in [j["name"] for j in db.get_junctions_list()]
+
+        db.remove_junction(junction_id)
+        assert "Zed" not in [j["name"] for j in db.get_junctions_list()]
+
+
+if __name__ == "__main__":
+    test_duplicate_junction_does_not_lock_database()
+    print("Duplicate junction test passed")
@@ -0,0 +1,146 @@
+# ================= CONFIG =================
+IOU_THRESHOLD = 0.3       # minimum overlap to continue a track
+CENTROID_FACTOR = 0.5     # fallback match: centre moved < factor * box diagonal
+CONFIRM_HITS = 3          # detections needed before a track is "confirmed"
+SETTLE_CONF = 0.0         # detections at least this confident count towards `settled_hits`
+MAX_AGE_FRAMES = 60       # frames without a detection before a track "left"
+# =========================================
+
+
+def _iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _centroid_close(a, b, factor):
+    ax, ay = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    bx, by = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    diag = max(((a[2] - a[0]) ** 2 + (a[3] - a[1]) ** 2) ** 0.5, 1.0)
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 < factor * diag
+
+
+class Track:
+    __slots__ = ("track_id", "label", "box", "hits", "confident_hits", "best_confidence",
+                 "first_frame", "last_frame", "confirmed")
+
+    def __init__(self, track_id, box, confidence, label, frame_index, confident=True):
+        self.track_id = track_id
+        self.label = label
+        self.box = box
+        self.hits = 1
+        self.confident_hits = 1 if confident else 0
+        self.best_confidence = confidence
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.confirmed = False
+
+
+class VehicleTracker:
+    """
+    Lightweight IoU/centroid tracker that turns per-frame boxes into
+    vehicle events.
+
+    `update()` takes the (x1, y1, x2, y2, conf, label) detections of one
+    inferred frame and returns the track assigned to each detection plus
+    the events raised on this frame. Each track produces exactly one
+    "entered", at most one "confirmed" (after `confirm_hits` detections) and
+    one "left" event (after MAX_AGE_FRAMES without a match, or on
+    `finish()`), so downstream side effects run once per vehicle rather
+    than once per box.
+
+    `settled_hits` is the most detections of at least `settle_conf` seen
+    on any confirmed track so far. It does not change which events are
+    raised; callers use it to decide when a verdict is certain enough.
+    """
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, confirm_hits=CONFIRM_HITS, max_age=MAX_AGE_FRAMES,
+                 settle_conf=SETTLE_CONF):
+        self.iou_threshold = iou_threshold
+        self.confirm_hits = confirm_hits
+        self.settle_conf = settle_conf
+        self.max_age = max_age
+        self.tracks = []
+        self.next_id = 1
+        self.settled_hits = 0
+
+    def _event(self, kind, track, frame_index):
+        return {
+            "event": kind,
+            "track_id": track.track_id,
+            "label": track.label,
+            "confidence": round(track.best_confidence, 2),
+            "confirmed": track.confirmed,
+            "frame": frame_index,
+            "first_frame": track.first_frame,
+            "last_frame": track.last_frame,
+        }
+
+    def update(self, frame_index, detections):
+        events = []
+
+        # Greedy association, best overlaps first
+        candidates = []
+        for ti, track in enumerate(self.tracks):
+            for di, det in enumerate(detections):
+                iou = _iou(track.box, det[:4])
+                if iou >= self.iou_threshold or _centroid_close(track.box, det[:4], CENTROID_FACTOR):
+                    candidates.append((iou, ti, di))
+        candidates.sort(reverse=True)
+
+        assigned = [None] * len(detections)
+        used_tracks = set()
+        for _, ti, di in candidates:
+            if ti in used_tracks or assigned[di] is not None:
+                continue
+            used_tracks.add(ti)
+            track = self.tracks[ti]
+            x1, y1, x2, y2, conf, label = detections[di]
+            track.box = (x1, y1, x2, y2)
+            track.hits += 1
+            if conf >= self.settle_conf:
+                track.confident_hits += 1
+            track.last_frame = frame_index
+            if conf >= track.best_confidence:
+                track.best_confidence = conf
+                track.label = label
+            if not track.confirmed and track.hits >= self.confirm_hits:
+                track.confirmed = True
+                events.append(self._event("confirmed", track, frame_index))
+            if track.confirmed:
+                self.settled_hits = max(self.settled_hits, track.confident_hits)
+            assigned[di] = track
+
+        for di, det in enumerate(detections):
+            if assigned[di] is None:
+                x1, y1, x2, y2, conf, label = det
+                track = Track(self.next_id, (x1, y1, x2, y2), conf, label, frame_index,
+                              confident=conf >= self.settle_conf)
+                self.next_id += 1
+                self.tracks.append(track)
+                events.append(self._event("entered", track, frame_index))
+                if self.confirm_hits <= 1:
+                    track.confirmed = True
+                    events.append(self._event("confirmed", track, frame_index))
+                    self.settled_hits = max(self.settled_hits, track.confident_hits)
+                assigned[di] = track
+
+        alive = []
+        for track in self.tracks:
+            if frame_index - track.last_frame > self.max_age:
+                events.append(self._event("left", track, frame_index))
+            else:
+                alive.append(track)
+        self.tracks = alive
+
+        return assigned, events
+
+    def finish(self, frame_index):
+        """End of stream: every remaining track leaves"""
+        events = [self._event("left", track, frame_index) for track in self.tracks]
+        self.tracks = []
+        return events